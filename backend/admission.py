@@ -0,0 +1,241 @@
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+import metrics
+
+ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Write requests cost one token per this many body bytes (capped at the
+# burst), so a huge basket draws down the bucket faster than a small one
+COST_BYTES = 16 * 1024
+# Idle buckets are dropped every this many decisions
+SWEEP_EVERY = 10000
+
+
+@dataclass(frozen=True)
+class Policy:
+    concurrency: int    # requests of the class in flight at once; 0 = no cap
+    rate: float         # tokens per second, per user and route; 0 = no limit
+    burst: int
+
+
+def _policy(name: str, concurrency: int, rate: float, burst: int) -> Policy:
+    prefix = f"ADMISSION_{name.upper()}_"
+    return Policy(
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        rate=float(os.getenv(prefix + "RATE", str(rate))),
+        burst=int(os.getenv(prefix + "BURST", str(burst))),
+    )
+
+
+# Sync routes share Starlette's 40-thread pool. Capping AI and write
+# classes well below that leaves threads for reads however busy they get.
+POLICIES = {
+    "ai": _policy("ai", concurrency=4, rate=0.1, burst=3),
+    "write": _policy("write", concurrency=24, rate=5, burst=20),
+    "read": _policy("read", concurrency=0, rate=50, burst=100),
+}
+
+
+def classify(name):
+    """Route decorator: admission class of the endpoint, None for exempt.
+
+    Routes without one are "read" for GET/HEAD and "write" otherwise.
+    """
+    def mark(endpoint):
+        endpoint.admission_class = name
+        return endpoint
+    return mark
+
+
+# --------------------
+# STORES
+# --------------------
+
+class AdmissionStore:
+    """Limiter state: token buckets and in-flight counters.
+
+    In-memory state is per worker. A multi-worker deployment swaps in a
+    store backed by something shared (Redis, ...) with the same methods.
+    """
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """Takes cost tokens and returns 0, or the seconds until it could."""
+        raise NotImplementedError
+
+    def acquire(self, name: str, limit: int) -> bool:
+        raise NotImplementedError
+
+    def release(self, name: str):
+        raise NotImplementedError
+
+    def in_flight(self) -> dict:
+        raise NotImplementedError
+
+
+class InMemoryStore(AdmissionStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}      # key -> [tokens, updated_at, rate, burst]
+        self._in_flight = {}    # class -> count
+        self._decisions = 0
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            self._decisions += 1
+            if self._decisions % SWEEP_EVERY == 0:
+                self._sweep(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now, rate, burst]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0.0
+            bucket[0] = tokens
+            return (cost - tokens) / rate
+
+    def _sweep(self, now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        self._buckets = {
+            key: b for key, b in self._buckets.items()
+            if b[0] + (now - b[1]) * b[2] < b[3]
+        }
+
+    def acquire(self, name, limit):
+        with self._lock:
+            count = self._in_flight.get(name, 0)
+            if count >= limit:
+                return False
+            self._in_flight[name] = count + 1
+            return True
+
+    def release(self, name):
+        with self._lock:
+            self._in_flight[name] -= 1
+
+    def in_flight(self):
+        with self._lock:
+            return dict(self._in_flight)
+
+
+# --------------------
+# CONTROLLER
+# --------------------
+
+class Controller:
+    def __init__(self, store: AdmissionStore = None, policies: dict = None,
+                 enabled: bool = ENABLED):
+        self.store = store or InMemoryStore()
+        self.policies = policies or POLICIES
+        self.enabled = enabled
+
+    def decide(self, name: str, route: str, user: str, cost: int = 1):
+        """("admitted" | "rate_limited" | "shed", retry_after_seconds)."""
+        policy = self.policies[name]
+        # Slot first: a shed request must not also spend the user's tokens
+        if policy.concurrency and not self.store.acquire(name, policy.concurrency):
+            return "shed", 1
+        if policy.rate:
+            wait = self.store.take(
+                f"{name}:{route}:{user}", policy.rate, policy.burst,
+                min(cost, policy.burst)
+            )
+            if wait:
+                if policy.concurrency:
+                    self.store.release(name)
+                return "rate_limited", wait
+        return "admitted", 0
+
+
+controller = Controller()
+
+
+def _match(scope):
+    for route in scope["app"].router.routes:
+        match, child = route.matches(scope)
+        if match == Match.FULL:
+            return route, child.get("path_params", {})
+    return None, None
+
+
+def _user_key(scope, path_params: dict) -> str:
+    # No auth here: the user a request acts for is in its path or query;
+    # bodies are not parsed, so those fall back to an explicit header or
+    # the client address
+    for name in ("user_id", "vendor_id"):
+        if name in path_params:
+            return f"user:{path_params[name]}"
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    for name in ("user_id", "vendor_id"):
+        if query.get(name):
+            return f"user:{query[name][0]}"
+    for header, value in scope["headers"]:
+        if header == b"x-user-id":
+            return f"user:{value.decode('latin-1')}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _cost(scope) -> int:
+    for header, value in scope["headers"]:
+        if header == b"content-length" and value.isdigit():
+            return 1 + int(value) // COST_BYTES
+    return 1
+
+
+class AdmissionMiddleware:
+    """Rate limits per user and route, caps concurrency per endpoint class.
+
+    Rejections are immediate: 429 when the caller is over their rate,
+    503 when the class is at capacity, both with Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not controller.enabled:
+            return await self.app(scope, receive, send)
+
+        route, path_params = _match(scope)
+        if route is None:
+            return await self.app(scope, receive, send)
+        default = "read" if scope["method"] in ("GET", "HEAD") else "write"
+        name = getattr(route.endpoint, "admission_class", default)
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        cost = 1 if name == "read" else _cost(scope)
+        decision, retry_after = controller.decide(
+            name, route.path, _user_key(scope, path_params), cost
+        )
+        metrics.registry.record_admission(name, decision)
+
+        if decision != "admitted":
+            scope["route"] = route      # so the rejection is labelled by route
+            if decision == "rate_limited":
+                status, detail = 429, "Too many requests"
+            else:
+                status, detail = 503, "Server busy"
+            response = JSONResponse(
+                {"detail": f"{detail}, retry shortly"},
+                status_code=status,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if controller.policies[name].concurrency:
+                controller.store.release(name)
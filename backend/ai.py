@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+
+@dataclass(frozen=True)
+class AISettings:
+    provider: str = "gemini"    # "gemini" or "stub"
+    model: str = "gemini-2.5-flash"
+    api_key: str = None
+    temperature: float = 0.4
+    stub_latency_ms: float = 0
+
+    @classmethod
+    def from_env(cls) -> "AISettings":
+        return cls(
+            provider=os.getenv("AI_PROVIDER", "gemini").lower(),
+            model=os.getenv("AI_MODEL", cls.model),
+            api_key=os.getenv("GEMINI_API_KEY"),
+            temperature=float(os.getenv("AI_TEMPERATURE", str(cls.temperature))),
+            stub_latency_ms=float(os.getenv("AI_STUB_LATENCY_MS", "0")),
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        # What a cached reply depends on besides the prompt
+        return f"{self.provider}:{self.model}"
+
+
+class Provider:
+    """Turns a prompt into the model's raw text reply."""
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    def __init__(self, settings: AISettings):
+        if not settings.api_key:
+            raise HTTPException(
+                status_code=503,
+                detail="AI insights are not configured (GEMINI_API_KEY is missing)"
+            )
+        # The SDK pulls in grpc and protobuf; only pay for that once a
+        # request actually needs it
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.api_key)
+        self._model = genai.GenerativeModel(settings.model)
+        self._temperature = settings.temperature
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        kwargs = {"request_options": {"timeout": timeout}} if timeout else {}
+        response = self._model.generate_content(
+            prompt,
+            generation_config={"temperature": self._temperature},
+            **kwargs
+        )
+        return response.text
+
+
+class StubProvider(Provider):
+    """Offline stand-in with a canned, well-formed reply."""
+
+    REPLY = json.dumps({
+        "top_products": [],
+        "underperforming_products": [],
+        "suggestions": ["Bundle slow movers with best sellers"],
+    })
+
+    def __init__(self, settings: AISettings = None, latency_ms: float = None):
+        if latency_ms is None:
+            latency_ms = settings.stub_latency_ms if settings else 0
+        self.latency_ms = latency_ms
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self.REPLY
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+_lock = threading.Lock()
+_settings = None
+_provider = None
+
+
+def get_settings() -> AISettings:
+    # Read on first use so .env has been loaded by then
+    global _settings
+    if _settings is None:
+        _settings = AISettings.from_env()
+    return _settings
+
+
+def get_provider() -> Provider:
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                settings = get_settings()
+                factory = PROVIDERS.get(settings.provider)
+                if factory is None:
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"Unknown AI provider {settings.provider!r}"
+                    )
+                _provider = factory(settings)
+    return _provider
+
+
+def configure(settings: AISettings = None):
+    """Replace the settings; the provider is rebuilt on next use.
+
+    None goes back to reading the environment.
+    """
+    global _settings, _provider
+    with _lock:
+        _settings = settings
+        _provider = None
@@ -0,0 +1,346 @@
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy import delete, select, text
+
+import models
+from db import SessionLocal, engine
+
+# Chats idle for this long have their history moved to the archive. The
+# newest message of each chat stays hot so inbox previews still work.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Background compaction period; 0 leaves it to `manage.py archive-messages`
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))
+
+BLOCK_MESSAGES = 500
+# Chats per transaction: the cursor advances with each batch, so an
+# interrupted run loses at most one batch of work
+CHATS_PER_BATCH = 20
+VACUUM_STEP_PAGES = 2000
+
+RUNNING = "running"
+DONE = "done"
+
+logger = logging.getLogger("archive")
+
+
+# --------------------
+# BLOCK ENCODING
+# --------------------
+
+def pack_block(rows: list) -> bytes:
+    # Columnar: each field's values sit together, which compresses better
+    # than one object per message. Ids are stored as deltas.
+    ids = [r.id for r in rows]
+    return orjson.dumps({
+        "id": [ids[0]] + [b - a for a, b in zip(ids, ids[1:])],
+        "sender_id": [r.sender_id for r in rows],
+        "text": [r.text for r in rows],
+        "created_at": [r.created_at for r in rows],
+    })
+
+
+def decode_block(chat_id: int, data: bytes) -> list:
+    cols = orjson.loads(zlib.decompress(data))
+    ids = []
+    current = 0
+    for delta in cols["id"]:
+        current += delta
+        ids.append(current)
+    return [
+        {
+            "id": message_id,
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "text": body,
+            "created_at": created_at,
+        }
+        for message_id, sender_id, body, created_at
+        in zip(ids, cols["sender_id"], cols["text"], cols["created_at"])
+    ]
+
+
+# --------------------
+# READS
+# --------------------
+# Every archived id is below every hot id of the same chat, so a page is
+# the archived slice followed by the hot one.
+
+def archived_through_statement(chat_id: int):
+    return select(models.Chat.archived_through_id).where(models.Chat.id == chat_id)
+
+
+def needs_archive(page: list, after_id: int, limit: int) -> bool:
+    # A full newest-first page never reaches past the hot rows
+    return after_id is not None or limit is None or len(page) < limit
+
+
+def block_index_statement(chat_id: int, before_id: int = None, after_id: int = None):
+    Block = models.MessageArchiveBlock
+    stmt = select(Block.first_id, Block.last_id, Block.message_count).where(
+        Block.chat_id == chat_id
+    )
+    if after_id is not None:
+        stmt = stmt.where(Block.last_id > after_id)
+    if before_id is not None:
+        stmt = stmt.where(Block.first_id < before_id)
+    return stmt.order_by(Block.first_id)
+
+
+def pick_blocks(index: list, limit: int, hot_count: int, newest_first: bool,
+                before_id: int = None, after_id: int = None) -> list:
+    """first_ids of the fewest blocks that can complete the page."""
+    if limit is None:
+        return [b.first_id for b in index]
+    # Newest first, the hot rows fill the page first; oldest first
+    # (after_id), the archived rows do
+    need = limit - hot_count if newest_first else limit
+    picked = []
+    found = 0
+    for block in (reversed(index) if newest_first else index):
+        picked.append(block.first_id)
+        # Blocks cut by the cursor may contribute nothing; don't count them
+        if (before_id is None or block.last_id < before_id) and \
+                (after_id is None or block.first_id > after_id):
+            found += block.message_count
+        if found >= need:
+            break
+    return picked
+
+
+def blocks_statement(chat_id: int, first_ids: list):
+    Block = models.MessageArchiveBlock
+    return (
+        select(Block.data)
+        .where(Block.chat_id == chat_id, Block.first_id.in_(first_ids))
+        .order_by(Block.first_id)
+    )
+
+
+def merge(chat_id: int, blocks: list, hot: list, before_id: int, after_id: int,
+          limit: int, newest_first: bool) -> list:
+    archived = [
+        m for data in blocks for m in decode_block(chat_id, data)
+        if (after_id is None or m["id"] > after_id)
+        and (before_id is None or m["id"] < before_id)
+    ]
+    combined = archived + list(hot)
+    if limit is None:
+        return combined
+    return combined[-limit:] if newest_first else combined[:limit]
+
+
+# --------------------
+# COMPACTION
+# --------------------
+
+CANDIDATES_SQL = """
+    SELECT c.id, c.archived_through_id, c.last_message_id
+    FROM chats c
+    WHERE c.id > :cursor
+      AND c.last_activity_at < :cutoff
+      AND EXISTS (
+          SELECT 1 FROM messages m
+          WHERE m.chat_id = c.id
+            AND m.id > COALESCE(c.archived_through_id, 0)
+            AND m.id < c.last_message_id
+      )
+    ORDER BY c.id
+    LIMIT :limit
+"""
+
+
+def archive_chat(db, chat_id: int, archived_through_id: int, last_message_id: int) -> tuple:
+    """Moves the chat's hot history, except its newest message, into blocks.
+
+    Runs in the caller's transaction. Returns (messages, raw bytes,
+    compressed bytes).
+    """
+    M = models.Message
+    rows = db.execute(
+        select(M.id, M.sender_id, M.text, M.created_at)
+        .where(
+            M.chat_id == chat_id,
+            M.id > (archived_through_id or 0),
+            M.id < last_message_id,
+        )
+        .order_by(M.id)
+    ).all()
+    if not rows:
+        return 0, 0, 0
+
+    raw = compressed = 0
+    for start in range(0, len(rows), BLOCK_MESSAGES):
+        chunk = rows[start:start + BLOCK_MESSAGES]
+        packed = pack_block(chunk)
+        data = zlib.compress(packed, 9)
+        raw += len(packed)
+        compressed += len(data)
+        db.add(models.MessageArchiveBlock(
+            chat_id=chat_id,
+            first_id=chunk[0].id,
+            last_id=chunk[-1].id,
+            message_count=len(chunk),
+            data=data,
+        ))
+
+    through = rows[-1].id
+    db.execute(
+        delete(M)
+        .where(M.chat_id == chat_id, M.id > (archived_through_id or 0), M.id <= through)
+        .execution_options(synchronize_session=False)
+    )
+    db.query(models.Chat).filter(models.Chat.id == chat_id).update(
+        {"archived_through_id": through}, synchronize_session=False
+    )
+    return len(rows), raw, compressed
+
+
+def file_bytes(db) -> int:
+    page_size = db.execute(text("PRAGMA page_size")).scalar()
+    return db.execute(text("PRAGMA page_count")).scalar() * page_size
+
+
+def incremental_vacuum(db, max_pages: int = None) -> int:
+    """Returns free pages to the filesystem; bytes reclaimed.
+
+    Only works once the file is in auto_vacuum=INCREMENTAL mode, which new
+    databases get from db.SQLITE_PRAGMAS and existing ones get from a
+    one-off `manage.py archive-messages --full-vacuum`.
+    """
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        logger.info("auto_vacuum is not INCREMENTAL; skipping vacuum step")
+        return 0
+
+    page_size = db.execute(text("PRAGMA page_size")).scalar()
+    before = db.execute(text("PRAGMA freelist_count")).scalar()
+    remaining = before if max_pages is None else min(before, max_pages)
+    db.commit()
+    # The pragma frees one page per step and pysqlite's execute() steps
+    # only once; executescript() runs it to completion
+    raw = db.connection().connection.driver_connection
+    while remaining > 0:
+        step = min(remaining, VACUUM_STEP_PAGES)
+        # Short steps so the write lock is released between them
+        raw.executescript(f"PRAGMA incremental_vacuum({step});")
+        remaining -= step
+    after = db.execute(text("PRAGMA freelist_count")).scalar()
+    return (before - after) * page_size
+
+
+def full_vacuum() -> int:
+    """One-off VACUUM, which also switches an old file to incremental mode.
+
+    Rewrites the whole file and blocks writers while it runs.
+    """
+    # VACUUM refuses to run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before = file_bytes(conn)
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        return before - file_bytes(conn)
+
+
+def run_to_dict(run: models.ArchiveRun) -> dict:
+    return {
+        "id": run.id,
+        "status": run.status,
+        "cutoff": run.cutoff,
+        "cursor_chat_id": run.cursor_chat_id,
+        "chats_archived": run.chats_archived,
+        "messages_archived": run.messages_archived,
+        "raw_bytes": run.raw_bytes,
+        "compressed_bytes": run.compressed_bytes,
+        "file_bytes_before": run.file_bytes_before,
+        "file_bytes_after": run.file_bytes_after,
+        "reclaimed_bytes": run.reclaimed_bytes,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+    }
+
+
+def compact(max_chats: int = None, days: int = ARCHIVE_AFTER_DAYS,
+            vacuum: bool = True) -> dict:
+    """Archives idle chats batch by batch, then vacuums.
+
+    Picks up an unfinished run where it stopped. With max_chats the run
+    may end still "running"; the next call carries on from its cursor.
+    """
+    with SessionLocal() as db:
+        run = db.query(models.ArchiveRun).filter(
+            models.ArchiveRun.status == RUNNING
+        ).first()
+        if run is None:
+            run = models.ArchiveRun(
+                status=RUNNING,
+                cutoff=datetime.utcnow() - timedelta(days=days),
+                cursor_chat_id=0,
+                chats_archived=0,
+                messages_archived=0,
+                raw_bytes=0,
+                compressed_bytes=0,
+                file_bytes_before=file_bytes(db),
+            )
+            db.add(run)
+            db.commit()
+
+        done = 0
+        while True:
+            if max_chats is not None and done >= max_chats:
+                # Out of budget; the next call resumes from the cursor
+                return run_to_dict(run)
+
+            batch = CHATS_PER_BATCH
+            if max_chats is not None:
+                batch = min(batch, max_chats - done)
+            chats = db.execute(text(CANDIDATES_SQL), {
+                "cursor": run.cursor_chat_id,
+                "cutoff": run.cutoff,
+                "limit": batch,
+            }).all()
+            if not chats:
+                break
+
+            for chat in chats:
+                count, raw, compressed = archive_chat(
+                    db, chat.id, chat.archived_through_id, chat.last_message_id
+                )
+                run.chats_archived += 1
+                run.messages_archived += count
+                run.raw_bytes += raw
+                run.compressed_bytes += compressed
+            # Cursor and archived rows commit together
+            run.cursor_chat_id = chats[-1].id
+            db.commit()
+            done += len(chats)
+
+        if vacuum:
+            run.reclaimed_bytes = incremental_vacuum(db)
+        run.file_bytes_after = file_bytes(db)
+        run.status = DONE
+        run.finished_at = datetime.utcnow()
+        db.commit()
+        return run_to_dict(run)
+
+
+def start_background(interval_hours: float = ARCHIVE_INTERVAL_HOURS):
+    if interval_hours <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                report = compact()
+                logger.info("archive run %s", report)
+            except Exception:
+                logger.exception("archive run failed; it resumes next time")
+            time.sleep(interval_hours * 3600)
+
+    thread = threading.Thread(target=loop, name="archive", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,439 @@
+"""Load-test the API in process against a synthetic dataset.
+
+Seeds a scratch SQLite database through the models, then drives main.app
+over httpx's ASGI transport with a few user flows:
+
+    chat       open a chat (page + mark read), then send a message
+    checkout   load a vendor's products, then post a bill
+    dashboard  analytics, 90-day timeseries and AI marketing insights
+    feed       first two pages of the campaign feed and one campaign
+    saturation cheap reads while other clients hammer AI insights, run
+               once with admission control off and once with it on
+
+The flow scenarios run with admission control off, since every bench
+client shares one address and would trip the per-user limits.
+
+AI calls go to the stub provider with a fixed latency, so runs are offline
+and repeatable. Results (p50/p95/p99 and throughput per scenario and per
+endpoint) are printed and written as JSON for comparing runs:
+
+    python bench_api.py --messages 1000000 --bills 1000000 --out before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCENARIOS = ("chat", "checkout", "dashboard", "feed", "saturation")
+
+NICHES = ["Lifestyle", "Fashion", "Fitness", "Tech", "Beauty", "Food", "Travel"]
+FOLLOWERS = ["1k–10k", "10k–50k", "50k–100k", "100k+"]
+ENGAGEMENT = ["High", "Medium", "Low"]
+CONTENT_TYPES = ["Reels", "Posts", "Stories", "Videos", "Blogs"]
+WORDS = (
+    "organic skincare serum glow vegan protein workout gym gadget review "
+    "phone camera travel food recipe street style summer launch eco bottle "
+    "coffee running yoga makeup unboxing budget premium limited edition"
+).split()
+
+CHUNK = 20000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vendors", type=int, default=200)
+    parser.add_argument("--influencers", type=int, default=2000)
+    parser.add_argument("--products-per-vendor", type=int, default=20)
+    parser.add_argument("--campaigns", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--bills", type=int, default=200000)
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="flows run per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--ai-latency-ms", type=float, default=200)
+    parser.add_argument("--ai-clients", type=int, default=60,
+                        help="AI clients in the saturation scenario")
+    parser.add_argument("--db", help="reuse or create this database file "
+                        "instead of a fresh temporary one")
+    parser.add_argument("--out", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+# --------------------
+# SEEDING
+# --------------------
+
+def _chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed(args):
+    from sqlalchemy import func, select
+
+    import crud
+    import models
+    from db import SessionLocal, engine, init_db
+
+    init_db()
+    with SessionLocal() as session:
+        if session.scalar(select(func.count()).select_from(models.User)):
+            print("database already seeded, reusing it")
+            return
+
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    vendors = range(1, args.vendors + 1)
+    influencers = range(args.vendors + 1, args.vendors + args.influencers + 1)
+    started = time.perf_counter()
+
+    def insert(model, rows):
+        count = 0
+        for chunk in _chunked(rows):
+            with engine.begin() as conn:
+                conn.execute(model.__table__.insert(), chunk)
+            count += len(chunk)
+        print(f"  {model.__tablename__}: {count}")
+
+    insert(models.User, (
+        {"id": i, "email": f"{'vendor' if i in vendors else 'creator'}{i}@example.com",
+         "role": "vendor" if i in vendors else "influencer", "tokens": 10 ** 6}
+        for i in range(1, args.vendors + args.influencers + 1)
+    ))
+    insert(models.InfluencerProfile, (
+        {"user_id": i, "name": f"Creator {i}", "niche": rnd.choice(NICHES),
+         "followers_range": rnd.choice(FOLLOWERS),
+         "engagement": rnd.choice(ENGAGEMENT), "availability": rnd.choice(["Open", "Busy"]),
+         "content_types": ",".join(rnd.sample(CONTENT_TYPES, 2)),
+         "bio": " ".join(rnd.sample(WORDS, 8))}
+        for i in influencers
+    ))
+
+    product_count = args.vendors * args.products_per_vendor
+    insert(models.Product, (
+        {"id": pid, "vendor_id": (pid - 1) // args.products_per_vendor + 1,
+         "product_name": f"{rnd.choice(WORDS).title()} {pid}",
+         "cost_price": round(rnd.uniform(2, 50), 2), "quantity_available": 10 ** 9}
+        for pid in range(1, product_count + 1)
+    ))
+    campaign_vendor = [rnd.choice(vendors) for _ in range(args.campaigns)]
+    insert(models.Campaign, (
+        {"id": cid, "vendor_id": campaign_vendor[cid - 1],
+         "product_name": " ".join(rnd.sample(WORDS, 2)).title(),
+         "description": " ".join(rnd.sample(WORDS, 12))}
+        for cid in range(1, args.campaigns + 1)
+    ))
+    # A chat is unique per (campaign, vendor, influencer) and the vendor
+    # is the campaign's owner, so draw distinct (campaign, influencer) pairs
+    pairs = len(influencers) * args.campaigns
+    if args.chats > pairs:
+        print(f"  only {pairs} distinct chats possible, seeding that many")
+        args.chats = pairs
+    insert(models.Chat, (
+        {"id": chat_id, "campaign_id": pair // len(influencers) + 1,
+         "vendor_id": campaign_vendor[pair // len(influencers)],
+         "influencer_id": influencers[pair % len(influencers)]}
+        for chat_id, pair in enumerate(rnd.sample(range(pairs), args.chats), 1)
+    ))
+
+    # Messages arrive in time order across random chats
+    step = timedelta(days=180) / max(args.messages, 1)
+    with engine.connect() as conn:
+        chat_members = {
+            chat_id: (vendor_id, influencer_id)
+            for chat_id, vendor_id, influencer_id in conn.execute(
+                select(models.Chat.id, models.Chat.vendor_id, models.Chat.influencer_id)
+            )
+        }
+
+    def messages():
+        start = now - timedelta(days=180)
+        for n in range(args.messages):
+            chat_id = rnd.randint(1, args.chats)
+            yield {"chat_id": chat_id, "sender_id": rnd.choice(chat_members[chat_id]),
+                   "text": " ".join(rnd.sample(WORDS, 6)), "created_at": start + step * n}
+    insert(models.Message, messages())
+
+    with engine.connect() as conn:
+        costs = dict(conn.execute(
+            select(models.Product.id, models.Product.cost_price)
+        ).all())
+
+    def bills():
+        for _ in range(args.bills):
+            pid = rnd.randint(1, product_count)
+            quantity = rnd.randint(1, 5)
+            cost = costs[pid]
+            price = round(cost * rnd.uniform(1.1, 2.0), 2)
+            yield {"vendor_id": (pid - 1) // args.products_per_vendor + 1,
+                   "product_id": pid, "quantity": quantity, "cost_price": cost,
+                   "selling_price": price, "profit": (price - cost) * quantity,
+                   "created_at": now - timedelta(seconds=rnd.randint(0, 365 * 86400))}
+    insert(models.Bill, bills())
+
+    with SessionLocal() as session:
+        crud.rebuild_sales_rollup(session)
+        crud.rebuild_sales_daily(session)
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+
+
+# --------------------
+# SCENARIOS
+# --------------------
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}   # name -> [seconds]
+
+    def add(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    async def call(self, client, method: str, url: str, label: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.add(label, time.perf_counter() - started)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def chat_flow(client, rec: Recorder, rnd: random.Random, args):
+    chat_id = rnd.randint(1, args.chats)
+    user_id = rnd.randint(1, args.vendors)
+    await rec.call(client, "GET", f"/messages/{chat_id}?limit=50", "GET /messages/{chat_id}")
+    await rec.call(client, "POST", f"/chats/{chat_id}/read", "POST /chats/{chat_id}/read",
+                   json={"user_id": user_id})
+    await rec.call(client, "POST", "/messages", "POST /messages",
+                   json={"chat_id": chat_id, "sender_id": user_id, "text": "benchmark message"})
+
+
+async def checkout_flow(client, rec: Recorder, rnd: random.Random, args):
+    vendor_id = rnd.randint(1, args.vendors)
+    products = (await rec.call(
+        client, "GET", f"/products?vendor_id={vendor_id}", "GET /products"
+    )).json()
+    basket = rnd.sample(products, min(3, len(products)))
+    await rec.call(client, "POST", "/bills", "POST /bills", json={
+        "vendor_id": vendor_id,
+        "items": [
+            {"product_id": p["id"], "quantity": rnd.randint(1, 3),
+             "selling_price": round(p["cost_price"] * 1.5, 2)}
+            for p in basket
+        ],
+    })
+
+
+async def dashboard_flow(client, rec: Recorder, rnd: random.Random, args):
+    vendor_id = rnd.randint(1, args.vendors)
+    await rec.call(client, "GET", f"/analytics/{vendor_id}", "GET /analytics/{vendor_id}")
+    start = (datetime.utcnow() - timedelta(days=90)).date().isoformat()
+    await rec.call(client, "GET", f"/analytics/{vendor_id}/timeseries?from={start}&bucket=week",
+                   "GET /analytics/{vendor_id}/timeseries")
+    await rec.call(client, "GET", f"/analytics/{vendor_id}/marketing",
+                   "GET /analytics/{vendor_id}/marketing")
+
+
+async def feed_flow(client, rec: Recorder, rnd: random.Random, args):
+    first = (await rec.call(client, "GET", "/campaigns?limit=24", "GET /campaigns")).json()
+    if first:
+        await rec.call(client, "GET", f"/campaigns?limit=24&before_id={first[-1]['id']}",
+                       "GET /campaigns")
+        await rec.call(client, "GET", f"/campaigns/{rnd.choice(first)['id']}",
+                       "GET /campaigns/{campaign_id}")
+
+
+FLOWS = {
+    "chat": chat_flow,
+    "checkout": checkout_flow,
+    "dashboard": dashboard_flow,
+    "feed": feed_flow,
+}
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    samples = sorted(samples)
+
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2)
+
+    return {
+        "count": len(samples),
+        "per_second": round(len(samples) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+async def run_scenario(app, name: str, args) -> dict:
+    import httpx
+
+    flow = FLOWS[name]
+    rec = Recorder()
+    remaining = iter(range(args.iterations))
+
+    async def worker(seed):
+        rnd = random.Random(seed)
+        for _ in remaining:
+            started = time.perf_counter()
+            await flow(client, rec, rnd, args)
+            rec.add("flow", time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    flow_samples = rec.samples.pop("flow")
+    return {
+        "seconds": round(elapsed, 2),
+        "flows": summarize(flow_samples, elapsed),
+        "requests_per_second": round(sum(map(len, rec.samples.values())) / elapsed, 1),
+        "endpoints": {
+            label: summarize(samples, elapsed)
+            for label, samples in sorted(rec.samples.items())
+        },
+    }
+
+
+async def run_saturation(app, args) -> dict:
+    """Read latency while AI clients keep every insight request busy."""
+    import httpx
+    import admission
+    import insight_cache
+
+    # Every AI call must reach the (slow) provider
+    insight_cache.cache.ttl_seconds = 0
+    results = {}
+    for enabled in (False, True):
+        admission.controller.enabled = enabled
+        rec = Recorder()
+        ai = {"completed": 0, "rejected": 0}
+        remaining = iter(range(args.iterations * 5))
+        reading = True
+
+        async def reader(seed):
+            rnd = random.Random(seed)
+            for _ in remaining:
+                if rnd.random() < 0.5:
+                    url, label = f"/products?vendor_id={rnd.randint(1, args.vendors)}", "GET /products"
+                else:
+                    url, label = f"/campaigns/{rnd.randint(1, args.campaigns)}", "GET /campaigns/{campaign_id}"
+                await rec.call(client, "GET", url, label,
+                               headers={"X-User-Id": f"reader-{seed}"})
+
+        async def ai_client(vendor_id):
+            while reading:
+                response = await client.get(f"/analytics/{vendor_id}/marketing")
+                if response.status_code in (429, 503):
+                    ai["rejected"] += 1
+                    await asyncio.sleep(0.1)
+                elif response.status_code < 400:
+                    ai["completed"] += 1
+                else:
+                    raise RuntimeError(f"marketing -> {response.status_code}: {response.text[:200]}")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            flooders = [
+                asyncio.create_task(ai_client(1 + i % args.vendors))
+                for i in range(args.ai_clients)
+            ]
+            await asyncio.sleep(1)     # let the AI load build up
+            started = time.perf_counter()
+            await asyncio.gather(*(reader(i) for i in range(4)))
+            elapsed = time.perf_counter() - started
+            reading = False
+            await asyncio.gather(*flooders)
+
+        results["admission_on" if enabled else "admission_off"] = {
+            "seconds": round(elapsed, 2),
+            "reads": summarize([s for v in rec.samples.values() for s in v], elapsed),
+            "endpoints": {
+                label: summarize(samples, elapsed)
+                for label, samples in sorted(rec.samples.items())
+            },
+            "ai": ai,
+        }
+    admission.controller.enabled = False
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(FLOWS) - {"saturation"}
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # db.py reads these at import, so they must be set before anything
+    # from the app is imported
+    scratch = None if args.db else tempfile.mkdtemp(prefix="bench-api-")
+    path = args.db or os.path.join(scratch, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+    print(f"database: {path}")
+
+    seed(args)
+
+    import admission
+    import ai
+    import main as app_module
+    ai.configure(ai.AISettings(provider="stub", stub_latency_ms=args.ai_latency_ms))
+    admission.controller.enabled = False
+
+    # One event loop for every scenario: the async engine's pooled
+    # connections must not outlive the loop they were opened on
+    async def run_all():
+        results = {}
+        for name in scenarios:
+            print(f"running {name} ...")
+            if name == "saturation":
+                results[name] = await run_saturation(app_module.app, args)
+                for mode, result in results[name].items():
+                    reads = result["reads"]
+                    print(f"  {mode}: reads p50 {reads['p50_ms']}ms, p95 {reads['p95_ms']}ms, "
+                          f"p99 {reads['p99_ms']}ms; AI {result['ai']}")
+                continue
+            results[name] = await run_scenario(app_module.app, name, args)
+            flows = results[name]["flows"]
+            print(f"  {flows['per_second']} flows/s, p50 {flows['p50_ms']}ms, "
+                  f"p95 {flows['p95_ms']}ms, p99 {flows['p99_ms']}ms")
+        return results
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "db")},
+        "scenarios": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Compare the sync and async database paths under mixed chat traffic.
+
+Each mode gets its own freshly seeded SQLite file, then CONCURRENCY
+clients issue REQUESTS requests, one session per request as get_db /
+get_async_db would: reads page a chat's messages or load an inbox,
+writes post a message.
+
+    python bench_db.py --requests 4000 --concurrency 40 --write-ratio 0.3
+
+--write-ratio 1 makes rps the messages per second each path sustains.
+
+Modes:
+    sync-default        the original engine: default pool, no pragmas
+    sync-tuned          SessionLocal's settings (pool sizing, WAL pragmas)
+    async               AsyncSessionLocal's settings through aiosqlite
+    async-group-commit  async, with writes batched by group_commit
+
+async-group-commit then sends a burst of keyed messages through
+crud.create_message_async from more clients than the pool has
+connections, and exits non-zero if any of them fails: a request that
+holds a connection while waiting on the writer would exhaust the pool.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import db
+import group_commit
+import models
+
+USERS = 200
+CHATS = 500
+MESSAGES_PER_CHAT = 50
+
+
+def seed(url: str):
+    engine = create_engine(url)
+    db.Base.metadata.create_all(bind=engine)
+    rnd = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "email": f"user{i}@example.com",
+             "role": "vendor" if i % 2 else "influencer"}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(models.Chat.__table__.insert(), [
+            {"id": i, "vendor_id": rnd.randrange(1, USERS, 2),
+             "influencer_id": rnd.randrange(2, USERS + 1, 2)}
+            for i in range(1, CHATS + 1)
+        ])
+        conn.execute(models.Message.__table__.insert(), [
+            {"chat_id": chat_id, "sender_id": 1, "text": f"message {n}"}
+            for chat_id in range(1, CHATS + 1)
+            for n in range(MESSAGES_PER_CHAT)
+        ])
+    engine.dispose()
+
+
+def plan(requests: int, write_ratio: float) -> list:
+    rnd = random.Random(1)
+    ops = []
+    for _ in range(requests):
+        chat_id = rnd.randint(1, CHATS)
+        if rnd.random() < write_ratio:
+            ops.append(("write", chat_id))
+        elif rnd.random() < 0.5:
+            ops.append(("messages", chat_id))
+        else:
+            ops.append(("inbox", rnd.randint(1, USERS)))
+    return ops
+
+
+def run_sync(session_factory, ops: list, concurrency: int) -> dict:
+    def request(op):
+        kind, key = op
+        started = time.perf_counter()
+        with session_factory() as session:
+            if kind == "write":
+                crud.create_message(session, key, 1, "benchmark")
+            elif kind == "messages":
+                crud.get_messages_by_chat(session, key, limit=50)
+            else:
+                crud.get_inbox(session, key)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(request, ops))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_async(session_factory, ops: list, concurrency: int,
+                    writer: group_commit.GroupCommitWriter = None) -> dict:
+    queue = list(reversed(ops))
+    latencies = []
+
+    async def client():
+        while queue:
+            kind, key = queue.pop()
+            started = time.perf_counter()
+            async with session_factory() as session:
+                if kind == "write" and writer is not None:
+                    await writer.submit({
+                        "chat_id": key, "sender_id": 1, "text": "benchmark",
+                        "created_at": datetime.utcnow(), "idempotency": None,
+                    })
+                elif kind == "write":
+                    await crud.create_message_async(session, key, 1, "benchmark")
+                elif kind == "messages":
+                    await crud.get_messages_by_chat_async(session, key, limit=50)
+                else:
+                    await crud.get_inbox_async(session, key)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started)
+    if writer is not None and writer.batches:
+        result["avg_batch"] = round(writer.items / writer.batches, 1)
+    return result
+
+
+async def keyed_burst(session_factory, writer: group_commit.GroupCommitWriter,
+                      clients: int) -> dict:
+    # The route's path: one request session per send, group commit on
+    crud._message_writers[asyncio.get_running_loop()] = writer
+    enabled, group_commit.ENABLED = group_commit.ENABLED, True
+    latencies = []
+
+    async def send(n):
+        started = time.perf_counter()
+        async with session_factory() as session:
+            await crud.create_message_async(
+                session, n % CHATS + 1, 1, f"burst {n}", idempotency_key=f"burst-{n}"
+            )
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        outcomes = await asyncio.gather(
+            *(send(n) for n in range(clients)), return_exceptions=True
+        )
+    finally:
+        group_commit.ENABLED = enabled
+    failures = [repr(o) for o in outcomes if isinstance(o, BaseException)]
+    result = summarize(latencies or [0.0], time.perf_counter() - started)
+    result["failed"] = len(failures)
+    if failures:
+        result["first_failure"] = failures[0]
+    return result
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--batch-max", type=int, default=group_commit.MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=float, default=group_commit.MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    ops = plan(args.requests, args.write_ratio)
+    workdir = tempfile.mkdtemp(prefix="bench-db-")
+    results = {}
+    try:
+        template = os.path.join(workdir, "seed.db")
+        seed(f"sqlite:///{template}")
+
+        for mode in ("sync-default", "sync-tuned", "async", "async-group-commit"):
+            path = os.path.join(workdir, f"{mode}.db")
+            shutil.copy(template, path)
+
+            if mode.startswith("async"):
+                engine = create_async_engine(
+                    f"sqlite+aiosqlite:///{path}",
+                    pool_size=db.POOL_SIZE, max_overflow=db.MAX_OVERFLOW,
+                    pool_timeout=5,     # a starved pool fails the burst quickly
+                )
+                event.listen(engine.sync_engine, "connect", db._set_sqlite_pragmas)
+                factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+                writer = None
+                if mode == "async-group-commit":
+                    writer = group_commit.GroupCommitWriter(
+                        crud.write_message_batch, factory,
+                        max_batch=args.batch_max, max_wait_ms=args.batch_wait_ms,
+                    )
+
+                async def run_mode():
+                    result = await run_async(factory, ops, args.concurrency, writer)
+                    if writer is not None:
+                        result["keyed_burst"] = await keyed_burst(
+                            factory, writer, db.POOL_SIZE + db.MAX_OVERFLOW + 10
+                        )
+                    await engine.dispose()
+                    return result
+
+                results[mode] = asyncio.run(run_mode())
+                continue
+
+            if mode == "sync-default":
+                engine = create_engine(
+                    f"sqlite:///{path}", connect_args={"check_same_thread": False}
+                )
+            else:
+                engine = create_engine(
+                    f"sqlite:///{path}",
+                    connect_args={"check_same_thread": False},
+                    pool_size=db.POOL_SIZE, max_overflow=db.MAX_OVERFLOW,
+                )
+                event.listen(engine, "connect", db._set_sqlite_pragmas)
+            factory = sessionmaker(bind=engine)
+            results[mode] = run_sync(factory, ops, args.concurrency)
+            engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    burst = results.get("async-group-commit", {}).get("keyed_burst")
+    if burst and burst["failed"]:
+        print(f"keyed burst: {burst['failed']} sends failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Compare JSON encoding paths and wire sizes for 10k-row list responses.
+
+Rows are loaded from a seeded in-memory SQLite database through the same
+crud functions the routes use, so the encoders see real ORM objects and
+RowMappings. Every row set is then encoded each way:
+
+    python bench_serialize.py --rows 10000 --repeat 5
+
+Encoders:
+    jsonable_encoder  FastAPI's default: jsonable_encoder + json.dumps
+    response_model    response_model=List[...]: validate, serialize, json.dumps
+    orjson_default    ORJSONResponse on a route returning ORM objects
+    type_adapter      serialization.encode: schemas.* TypeAdapter to bytes
+
+Compression is measured on the type_adapter body at the levels
+compression.CompressionMiddleware uses.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import compression
+import crud
+import db
+import models
+import schemas
+import serialization
+
+VENDOR_ID = 1
+INFLUENCER_ID = 2
+
+
+def seed(rows: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    db.Base.metadata.create_all(bind=engine)
+    rnd = random.Random(0)
+    now = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": VENDOR_ID, "email": "vendor@example.com", "role": "vendor"},
+            {"id": INFLUENCER_ID, "email": "creator@example.com", "role": "influencer"},
+        ])
+        conn.execute(models.Campaign.__table__.insert(), [
+            {"id": i, "vendor_id": VENDOR_ID, "product_name": f"Product {i}",
+             "description": f"Launch campaign number {i} for a new summer line"}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(models.Product.__table__.insert(), [
+            {"id": i, "vendor_id": VENDOR_ID, "product_name": f"Product {i}",
+             "cost_price": round(rnd.uniform(1, 200), 2),
+             "quantity_available": rnd.randrange(0, 1000)}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(models.Chat.__table__.insert(), [
+            {"id": i, "campaign_id": i, "vendor_id": VENDOR_ID,
+             "influencer_id": INFLUENCER_ID, "last_message_id": i,
+             "last_activity_at": now + timedelta(seconds=i)}
+            for i in range(1, rows + 1)
+        ])
+        # One message per chat for the inbox, plus the rest in chat 1 so
+        # a single history page holds all of them
+        conn.execute(models.Message.__table__.insert(), [
+            {"id": i, "chat_id": i if i <= rows // 2 else 1,
+             "sender_id": INFLUENCER_ID if i % 2 else VENDOR_ID,
+             "text": f"Message {i}: sounds good, sending the draft tonight",
+             "created_at": now + timedelta(seconds=i)}
+            for i in range(1, rows + 1)
+        ])
+    return sessionmaker(bind=engine)
+
+
+def datasets(session, rows: int) -> dict:
+    return {
+        "messages": (
+            schemas.MESSAGE_LIST,
+            session.query(models.Message).order_by(models.Message.id).limit(rows).all(),
+        ),
+        "products": (schemas.PRODUCT_LIST, crud.get_products(session, VENDOR_ID)),
+        "campaigns": (
+            schemas.CAMPAIGN_LIST,
+            crud.get_all_campaigns(session, vendor_id=VENDOR_ID, limit=rows),
+        ),
+        "inbox": (schemas.INBOX, crud.get_inbox(session, VENDOR_ID)),
+    }
+
+
+def _stdlib_dumps(content) -> bytes:
+    # What fastapi.responses.JSONResponse.render does
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encoders(adapter):
+    def response_model(rows):
+        value = adapter.validate_python(rows, from_attributes=True)
+        return _stdlib_dumps(jsonable_encoder(adapter.dump_python(value, mode="json")))
+
+    return {
+        "jsonable_encoder": lambda rows: _stdlib_dumps(jsonable_encoder(rows)),
+        "response_model": response_model,
+        "orjson_default": lambda rows: orjson.dumps(
+            jsonable_encoder(rows), option=orjson.OPT_NON_STR_KEYS
+        ),
+        "type_adapter": lambda rows: serialization.encode(adapter, rows),
+    }
+
+
+def timed(fn, repeat: int):
+    fn()    # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - started)
+    return out, round(statistics.median(samples) * 1000, 2)
+
+
+def compressed(body: bytes, repeat: int) -> dict:
+    results = {"identity": {"bytes": len(body)}}
+    codecs = {
+        "gzip": lambda: compression._Compressor("gzip").chunk(body, last=True),
+    }
+    if compression.brotli is not None:
+        codecs["br"] = lambda: compression._Compressor("br").chunk(body, last=True)
+    for name, fn in codecs.items():
+        out, ms = timed(fn, repeat)
+        results[name] = {"bytes": len(out), "compress_ms": ms}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    factory = seed(args.rows)
+    results = {}
+    with factory() as session:
+        for name, (adapter, rows) in datasets(session, args.rows).items():
+            entry = {"rows": len(rows), "encode_ms": {}, "encode_bytes": {}}
+            body = None
+            for encoder, fn in encoders(adapter).items():
+                body, ms = timed(lambda: fn(rows), args.repeat)
+                entry["encode_ms"][encoder] = ms
+                entry["encode_bytes"][encoder] = len(body)
+            entry["wire"] = compressed(body, args.repeat)
+            results[name] = entry
+
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+import csv
+import os
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import crud
+import schemas
+from db import SessionLocal
+
+# Bills applied per transaction. Larger chunks amortize the fsync; smaller
+# ones hold SQLite's write lock for less time.
+CHUNK_SIZE = int(os.getenv("BULK_BILL_CHUNK_SIZE", "1000"))
+
+CSV_COLUMNS = {"vendor_id", "product_id", "quantity", "selling_price"}
+
+
+def detect_format(content_type: str) -> str:
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", ""):
+        return "ndjson"
+    raise HTTPException(
+        status_code=415,
+        detail="Send bills as application/x-ndjson or text/csv"
+    )
+
+
+async def _lines(stream):
+    # Split the request body into lines without buffering all of it
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+def _error(line_no: int, exc) -> dict:
+    if isinstance(exc, ValidationError):
+        message = "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'bill'}: {err['msg']}"
+            for err in exc.errors()
+        )
+    else:
+        message = str(exc)
+    return {"line": line_no, "ok": False, "error": message}
+
+
+async def _ndjson_bills(lines):
+    # One BulkBillCreate JSON object per line
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, schemas.BulkBillCreate.model_validate_json(line)
+        except ValidationError as exc:
+            yield line_no, _error(line_no, exc)
+
+
+async def _csv_bills(lines):
+    # Header row required. Consecutive rows sharing a bill_ref form one
+    # bill; without a bill_ref column every row is its own bill.
+    header = None
+    group = []  # [(line_no, row)]
+
+    def flush():
+        first_line, first = group[0]
+        # A row shorter than the header lacks the trailing columns; the
+        # whole bill is rejected rather than applied without that item
+        for line, row in group:
+            missing = CSV_COLUMNS - row.keys()
+            if missing:
+                group.clear()
+                return line, _error(
+                    line, f"row is missing columns: {', '.join(sorted(missing))}"
+                )
+        try:
+            bill = schemas.BulkBillCreate.model_validate({
+                "vendor_id": first["vendor_id"],
+                "sold_at": first.get("sold_at") or None,
+                "items": [
+                    {
+                        "product_id": row["product_id"],
+                        "quantity": row["quantity"],
+                        "selling_price": row["selling_price"],
+                    }
+                    for _, row in group
+                ],
+            })
+        except ValidationError as exc:
+            bill = _error(first_line, exc)
+        group.clear()
+        return first_line, bill
+
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+
+        if header is None:
+            header = [h.strip() for h in values]
+            missing = CSV_COLUMNS - set(header)
+            if missing:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"CSV header missing columns: {', '.join(sorted(missing))}"
+                )
+            continue
+
+        row = dict(zip(header, values))
+        ref = row.get("bill_ref")
+        if group and (not ref or group[0][1].get("bill_ref") != ref):
+            yield flush()
+        group.append((line_no, row))
+
+    if group:
+        yield flush()
+
+
+def apply_chunk(entries: list) -> list:
+    # entries: [(line_no, BulkBillCreate)] that already passed validation
+    with SessionLocal() as db:
+        results = crud.create_bills_bulk(db, [bill for _, bill in entries])
+    return [
+        {"line": line_no, **result}
+        for (line_no, _), result in zip(entries, results)
+    ]
+
+
+async def import_bills(stream, fmt: str, run_sync) -> dict:
+    parse = _csv_bills if fmt == "csv" else _ndjson_bills
+
+    results = []
+    failed_chunks = []
+    pending = []
+
+    async def apply(entries):
+        # Earlier chunks are committed already, so a chunk that gives up
+        # (stock contention, locked database) is reported, not raised:
+        # the client resends just those lines
+        try:
+            results.extend(await run_sync(apply_chunk, entries))
+        except HTTPException as exc:
+            failed_chunks.append({
+                "first_line": entries[0][0],
+                "last_line": entries[-1][0],
+                "error": exc.detail,
+            })
+            results.extend(
+                {"line": line_no, "ok": False, "error": exc.detail, "retryable": True}
+                for line_no, _ in entries
+            )
+
+    async for line_no, bill in parse(_lines(stream)):
+        if isinstance(bill, dict):
+            results.append(bill)
+            continue
+        pending.append((line_no, bill))
+        if len(pending) >= CHUNK_SIZE:
+            await apply(pending)
+            pending = []
+
+    if pending:
+        await apply(pending)
+
+    results.sort(key=lambda r: r["line"])
+    accepted = sum(1 for r in results if r["ok"])
+    return {
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "failed_chunks": failed_chunks,
+        "results": results,
+    }
@@ -1,22 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, func, cast, Integer, insert, update, bindparam, select
+from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from db import async_write_lock
 import models
+import schemas
+import realtime
+import idempotency
+import group_commit
+import archive
+import insight_cache
+import metrics
+import response_cache
+import discovery
+import matching
+import ai
+import asyncio
 import json
-import os
-import google.generativeai as genai
+import re
+import weakref
 from fastapi import HTTPException
-from dotenv import load_dotenv
-from pathlib import Path
-
-# Load .env relative to this file to ensure the key is available
-BASE_DIR = Path(__file__).resolve().parent
-load_dotenv(BASE_DIR / ".env")
-
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise RuntimeError("GEMINI_API_KEY not found in environment")
-
-genai.configure(api_key=api_key)
+from datetime import datetime, date, timedelta, timezone
 
 
 # --------------------
@@ -24,26 +29,108 @@ genai.configure(api_key=api_key)
 # --------------------
 
 def create_or_get_user(db: Session, email: str, role: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
+    # Returning users only need the read. For a first login the insert is
+    # a single statement that becomes a no-op if a concurrent login won on
+    # the unique email index; either way the row read back is the winner.
+    query = db.query(models.User).filter(models.User.email == email)
+    user = query.first()
     if user:
         return user
-    user = models.User(email=email, role=role)
-    db.add(user)
+
+    db.execute(
+        sqlite_insert(models.User)
+        .values(email=email, role=role)
+        .on_conflict_do_nothing(index_elements=["email"])
+    )
     db.commit()
-    db.refresh(user)
-    return user
+    return query.first()
 
 def get_user_tokens(db: Session, user_id: int):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     return user.tokens if user else 0
 
-def deduct_tokens(db: Session, user_id: int, amount: int):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user or user.tokens < amount:
+async def get_user_tokens_async(db: AsyncSession, user_id: int):
+    tokens = await db.scalar(
+        select(models.User.tokens).where(models.User.id == user_id)
+    )
+    return tokens or 0
+
+def _ledger_entry(db: Session, user_id: int, idempotency_key: str):
+    return (
+        db.query(models.TokenLedger)
+        .filter(
+            models.TokenLedger.user_id == user_id,
+            models.TokenLedger.idempotency_key == idempotency_key,
+        )
+        .first()
+    )
+
+
+def _ledger_replay(entry: models.TokenLedger, amount: int, reason: str) -> int:
+    # Same key, different deduction: refuse rather than report the old
+    # balance as if this one had been applied
+    if entry.delta != -amount or entry.reason != reason:
+        raise idempotency.conflict()
+    return entry.balance_after
+
+
+def deduct_tokens(
+    db: Session,
+    user_id: int,
+    amount: int,
+    idempotency_key: str = None,
+    reason: str = "deduct"
+):
+    if idempotency_key:
+        seen = _ledger_entry(db, user_id, idempotency_key)
+        if seen:
+            return _ledger_replay(seen, amount, reason)
+
+    # Check and spend in one statement, so two concurrent calls can't
+    # both pass the balance check.
+    balance = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.tokens >= amount)
+        .values(tokens=models.User.tokens - amount)
+        .returning(models.User.tokens)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    if balance is None:
+        db.rollback()
         return "INSUFFICIENT"
-    user.tokens -= amount
-    db.commit()
-    return user.tokens
+
+    db.add(models.TokenLedger(
+        user_id=user_id,
+        delta=-amount,
+        balance_after=balance,
+        reason=reason,
+        idempotency_key=idempotency_key,
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a retry using the same key; rolling back also
+        # undoes our UPDATE, so the user is charged once.
+        db.rollback()
+        return _ledger_replay(_ledger_entry(db, user_id, idempotency_key), amount, reason)
+
+    return balance
+
+
+def get_token_history(
+    db: Session,
+    user_id: int,
+    before_id: int = None,
+    limit: int = 50
+):
+    # Newest first, paged with the last id of the previous page
+    query = db.query(models.TokenLedger).filter(
+        models.TokenLedger.user_id == user_id
+    )
+    if before_id is not None:
+        query = query.filter(models.TokenLedger.id < before_id)
+    return query.order_by(models.TokenLedger.id.desc()).limit(limit).all()
 
 def create_campaign(db: Session, vendor_id: int, product_name: str, description: str):
     campaign = models.Campaign(
@@ -52,13 +139,151 @@ def create_campaign(db: Session, vendor_id: int, product_name: str, description:
         description=description
     )
     db.add(campaign)
+    # The feed, vendor lists and search all read every campaign
+    response_cache.versions.bump(db, ("campaigns",))
     db.commit()
     db.refresh(campaign)
     return campaign
 
 
-def get_all_campaigns(db: Session):
-    return db.query(models.Campaign).all()
+CAMPAIGN_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS campaigns_fts USING fts5(
+        product_name, description,
+        content='campaigns', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_ai AFTER INSERT ON campaigns BEGIN
+        INSERT INTO campaigns_fts(rowid, product_name, description)
+        VALUES (new.id, new.product_name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_ad AFTER DELETE ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, product_name, description)
+        VALUES ('delete', old.id, old.product_name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_au AFTER UPDATE ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, product_name, description)
+        VALUES ('delete', old.id, old.product_name, old.description);
+        INSERT INTO campaigns_fts(rowid, product_name, description)
+        VALUES (new.id, new.product_name, new.description);
+    END
+    """,
+]
+
+# Flipped off when this SQLite build lacks FTS5; search then uses LIKE
+campaign_fts_enabled = True
+
+
+def ensure_campaign_search(db: Session):
+    global campaign_fts_enabled
+    try:
+        exists = db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'campaigns_fts'"
+        )).first()
+        for ddl in CAMPAIGN_SEARCH_DDL:
+            db.execute(text(ddl))
+        if not exists:
+            # Index campaigns written before the search table existed
+            db.execute(text("INSERT INTO campaigns_fts(campaigns_fts) VALUES ('rebuild')"))
+        db.commit()
+    except OperationalError:
+        db.rollback()
+        campaign_fts_enabled = False
+
+
+def _fts_query(q: str) -> str:
+    # Quote every term so user input can't inject FTS syntax; the last
+    # term is a prefix match for search-as-you-type.
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_campaigns(db: Session, q: str, limit: int = 20, offset: int = 0):
+    if not campaign_fts_enabled:
+        pattern = f"%{q}%"
+        return (
+            db.query(models.Campaign)
+            .filter(
+                models.Campaign.product_name.ilike(pattern) |
+                models.Campaign.description.ilike(pattern)
+            )
+            .order_by(models.Campaign.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    match = _fts_query(q)
+    if match is None:
+        return []
+
+    # bm25 weights: a hit in the product name counts more than one in
+    # the description
+    ids = db.execute(
+        text("""
+            SELECT rowid FROM campaigns_fts
+            WHERE campaigns_fts MATCH :match
+            ORDER BY bm25(campaigns_fts, 4.0, 1.0)
+            LIMIT :limit OFFSET :offset
+        """),
+        {"match": match, "limit": limit, "offset": offset}
+    ).scalars().all()
+
+    by_id = {
+        c.id: c for c in
+        db.query(models.Campaign).filter(models.Campaign.id.in_(ids)).all()
+    }
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def get_campaign(db: Session, campaign_id: int):
+    return db.get(models.Campaign, campaign_id)
+
+
+def get_campaign_matches(db: Session, campaign: models.Campaign, limit: int):
+    matching.engine.ensure_loaded(db)
+    ranked = matching.engine.top_matches(campaign, limit)
+
+    ids = [pid for _, pid, _ in ranked]
+    by_id = {
+        p.id: p for p in
+        db.query(models.InfluencerProfile)
+        .filter(models.InfluencerProfile.id.in_(ids))
+        .all()
+    }
+    return [
+        {
+            "score": round(score, 4),
+            "signals": signals,
+            "profile": profile_to_dict(by_id[pid]),
+        }
+        for score, pid, signals in ranked if pid in by_id
+    ]
+
+
+def get_all_campaigns(
+    db: Session,
+    vendor_id: int = None,
+    before_id: int = None,
+    limit: int = None
+):
+    # Newest first; pass the last id back as before_id for the next page
+    query = db.query(models.Campaign)
+    if vendor_id is not None:
+        query = query.filter(models.Campaign.vendor_id == vendor_id)
+    if before_id is not None:
+        query = query.filter(models.Campaign.id < before_id)
+    return query.order_by(models.Campaign.id.desc()).limit(limit).all()
 
 
 
@@ -69,27 +294,30 @@ def create_or_get_chat(
     vendor_id: int,
     influencer_id: int
 ):
-    chat = (
-        db.query(models.Chat)
-        .filter(
-            models.Chat.campaign_id == campaign_id,
-            models.Chat.vendor_id == vendor_id,
-            models.Chat.influencer_id == influencer_id
-        )
-        .first()
+    query = db.query(models.Chat).filter(
+        models.Chat.campaign_id == campaign_id,
+        models.Chat.vendor_id == vendor_id,
+        models.Chat.influencer_id == influencer_id
     )
-
-    if not chat:
-        chat = models.Chat(
+    chat = query.first()
+    if chat:
+        return chat
+
+    # Same shape as create_or_get_user: a double click that loses the
+    # race on ux_chats_campaign_participants reads the winner's chat
+    db.execute(
+        sqlite_insert(models.Chat)
+        .values(
             campaign_id=campaign_id,
             vendor_id=vendor_id,
             influencer_id=influencer_id
         )
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
-
-    return chat
+        .on_conflict_do_nothing(
+            index_elements=["campaign_id", "vendor_id", "influencer_id"]
+        )
+    )
+    db.commit()
+    return query.first()
 
 
 def get_chats_by_user(db: Session, user_id: int):
@@ -102,6 +330,117 @@ def get_chats_by_user(db: Session, user_id: int):
         .all()
     )
 
+def _read_marker_upsert(chat_id: int = None, user_id: int = None, message_id: int = None):
+    # Markers only move forward. Without arguments the statement takes
+    # its values as executemany parameters.
+    stmt = sqlite_insert(models.ChatReadMarker)
+    if chat_id is not None:
+        stmt = stmt.values(
+            chat_id=chat_id, user_id=user_id, last_read_message_id=message_id
+        )
+    return stmt.on_conflict_do_update(
+        index_elements=["chat_id", "user_id"],
+        set_={
+            "last_read_message_id": func.max(
+                models.ChatReadMarker.last_read_message_id,
+                stmt.excluded.last_read_message_id,
+            )
+        },
+    )
+
+
+def mark_chat_read(db: Session, chat_id: int, user_id: int, message_id: int):
+    # Caller commits
+    db.execute(_read_marker_upsert(chat_id, user_id, message_id))
+
+
+async def mark_chat_read_async(
+    db: AsyncSession, chat_id: int, user_id: int, message_id: int
+):
+    await db.execute(_read_marker_upsert(chat_id, user_id, message_id))
+
+
+INBOX_SQL = """
+    SELECT
+        c.id,
+        c.campaign_id,
+        camp.product_name AS campaign_name,
+        c.vendor_id,
+        c.influencer_id,
+        cu.id AS counterpart_id,
+        cu.email AS counterpart_email,
+        cu.role AS counterpart_role,
+        prof.name AS counterpart_name,
+        m.id AS last_message_id,
+        m.sender_id AS last_message_sender_id,
+        m.text AS last_message_text,
+        c.last_activity_at,
+        (
+            SELECT COUNT(*) FROM messages um
+            WHERE um.chat_id = c.id
+              AND um.id > COALESCE(r.last_read_message_id, 0)
+              AND um.sender_id != :user_id
+        ) AS unread_count
+    FROM chats c
+    LEFT JOIN campaigns camp ON camp.id = c.campaign_id
+    LEFT JOIN users cu ON cu.id = CASE
+        WHEN c.vendor_id = :user_id THEN c.influencer_id ELSE c.vendor_id END
+    LEFT JOIN influencer_profiles prof ON prof.user_id = cu.id
+    LEFT JOIN messages m ON m.id = c.last_message_id
+    LEFT JOIN chat_read_markers r ON r.chat_id = c.id AND r.user_id = :user_id
+    WHERE c.vendor_id = :user_id OR c.influencer_id = :user_id
+    ORDER BY c.last_activity_at IS NULL, c.last_activity_at DESC, c.id DESC
+"""
+
+
+def get_inbox(db: Session, user_id: int):
+    # One statement for the whole inbox: the OR is served by the two
+    # participant indexes and unread counts are range scans on
+    # ix_messages_chat_id_id above each read marker.
+    return db.execute(text(INBOX_SQL), {"user_id": user_id}).mappings().all()
+
+
+async def get_inbox_async(db: AsyncSession, user_id: int):
+    result = await db.execute(text(INBOX_SQL), {"user_id": user_id})
+    return result.mappings().all()
+
+
+def backfill_chat_activity(db: Session):
+    # Chats created before last_message_id existed
+    db.execute(text("""
+        UPDATE chats SET
+            last_message_id = (
+                SELECT MAX(id) FROM messages WHERE messages.chat_id = chats.id
+            ),
+            last_activity_at = (
+                SELECT created_at FROM messages WHERE messages.id = (
+                    SELECT MAX(id) FROM messages WHERE messages.chat_id = chats.id
+                )
+            )
+        WHERE last_message_id IS NULL
+          AND EXISTS (SELECT 1 FROM messages WHERE messages.chat_id = chats.id)
+    """))
+    db.commit()
+
+
+def _touch_chat(message: models.Message):
+    # Keep the inbox columns current in the same transaction as the insert
+    return (
+        update(models.Chat)
+        .where(models.Chat.id == message.chat_id)
+        .values(last_message_id=message.id, last_activity_at=message.created_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _publish_message(message: models.Message):
+    # Push to open /ws/chats/{chat_id} sockets only after the commit
+    realtime.hub.publish(
+        message.chat_id,
+        schemas.MessageOut.model_validate(message).model_dump(mode="json")
+    )
+
+
 def create_message(
     db: Session,
     chat_id: int,
@@ -115,23 +454,346 @@ def create_message(
     )
 
     db.add(message)
+    db.flush()
+
+    # The sender has read their own message
+    db.execute(_touch_chat(message))
+    mark_chat_read(db, chat_id, sender_id, message.id)
+
     db.commit()
     db.refresh(message)
 
+    _publish_message(message)
     return message
 
 
+async def create_message_async(
+    db: AsyncSession,
+    chat_id: int,
+    sender_id: int,
+    text: str,
+    idempotency_key: str = None
+):
+    scope = f"messages:{sender_id}"
+    digest = idempotency.request_hash({"chat_id": chat_id, "text": text})
+
+    if group_commit.ENABLED:
+        # No lookup here: write_message_batch checks keys itself, and a
+        # query on db would hold one of its pooled connections while the
+        # writer waits for another, which starves the pool under load
+        return await message_writer().submit({
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "text": text,
+            "created_at": datetime.utcnow(),
+            "idempotency": (scope, idempotency_key, digest) if idempotency_key else None,
+        })
+
+    if idempotency_key:
+        seen = await idempotency.lookup_async(db, scope, idempotency_key, digest)
+        if seen:
+            return seen
+
+    message = models.Message(
+        chat_id=chat_id,
+        sender_id=sender_id,
+        text=text
+    )
+
+    async with async_write_lock():
+        db.add(message)
+        await db.flush()
+
+        await db.execute(_touch_chat(message))
+        await mark_chat_read_async(db, chat_id, sender_id, message.id)
+        if idempotency_key:
+            idempotency.remember(
+                db, scope, idempotency_key, digest,
+                schemas.MessageOut.model_validate(message).model_dump(mode="json")
+            )
+            prune = idempotency.prune_statement()
+            if prune is not None:
+                await db.execute(prune)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A retry with the same key committed first; this message
+            # rolls back and the retry's stored copy is returned
+            await db.rollback()
+            if not idempotency_key:
+                raise
+            return await idempotency.lookup_async(db, scope, idempotency_key, digest)
+
+    _publish_message(message)
+    return message
+
+
+async def write_message_batch(db: AsyncSession, items: list) -> list:
+    # Group-commit path of create_message_async: the whole batch is one
+    # multi-row INSERT ... RETURNING, one chat touch and read-marker upsert
+    # per chat, and a single commit (one fsync) instead of one per message.
+    results = [None] * len(items)
+    first_by_key = {}   # (scope, key) -> index of the first item using it
+    rows = []
+    for i, item in enumerate(items):
+        keyed = item["idempotency"]
+        if keyed:
+            if first_by_key.setdefault(keyed[:2], i) != i:
+                continue    # a retry queued next to its original
+            # A batch that committed after the caller's lookup may hold it
+            try:
+                results[i] = await idempotency.lookup_async(db, *keyed)
+            except HTTPException as exc:
+                results[i] = exc
+            if results[i] is not None:
+                continue
+        rows.append((i, item))
+
+    written = []
+    if rows:
+        ids = (await db.execute(
+            insert(models.Message).returning(
+                models.Message.id, sort_by_parameter_order=True
+            ),
+            [
+                {k: item[k] for k in ("chat_id", "sender_id", "text", "created_at")}
+                for _, item in rows
+            ],
+        )).scalars().all()
+
+        latest = {}     # chat_id -> newest message
+        read = {}       # (chat_id, sender_id) -> newest message id
+        for (i, item), message_id in zip(rows, ids):
+            out = schemas.MessageOut(id=message_id, **{
+                k: item[k] for k in ("chat_id", "sender_id", "text", "created_at")
+            })
+            results[i] = out
+            written.append(out)
+            latest[out.chat_id] = out
+            read[(out.chat_id, out.sender_id)] = out.id
+
+        await db.execute(update(models.Chat), [
+            {"id": chat_id, "last_message_id": m.id, "last_activity_at": m.created_at}
+            for chat_id, m in latest.items()
+        ])
+        await db.execute(_read_marker_upsert(), [
+            {"chat_id": chat_id, "user_id": sender_id, "last_read_message_id": message_id}
+            for (chat_id, sender_id), message_id in read.items()
+        ])
+
+        if first_by_key:
+            prune = idempotency.prune_statement()
+            if prune is not None:
+                await db.execute(prune)
+        # Added last so they are flushed by the commit itself
+        for i, item in rows:
+            if item["idempotency"]:
+                idempotency.remember(
+                    db, *item["idempotency"], results[i].model_dump(mode="json")
+                )
+
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            keyed = items[0]["idempotency"]
+            if len(items) > 1 or not keyed:
+                raise
+            # Another worker committed this key first
+            return [await idempotency.lookup_async(db, *keyed)]
+
+    for out in written:
+        _publish_message(out)
+
+    for i, item in enumerate(items):
+        if results[i] is not None:
+            continue
+        # Same key as an earlier item: replay it if it is the same request
+        first = first_by_key[item["idempotency"][:2]]
+        if items[first]["idempotency"][2] != item["idempotency"][2]:
+            results[i] = idempotency.conflict()
+        else:
+            results[i] = results[first]
+    return results
+
+
+_message_writers = weakref.WeakKeyDictionary()  # event loop -> writer
+
+
+def message_writer() -> group_commit.GroupCommitWriter:
+    # Same per-loop reasoning as db.async_write_lock
+    loop = asyncio.get_running_loop()
+    writer = _message_writers.get(loop)
+    if writer is None:
+        writer = _message_writers[loop] = group_commit.GroupCommitWriter(
+            write_message_batch
+        )
+    return writer
+
+
+def _messages_page(
+    chat_id: int,
+    before_id: int = None,
+    after_id: int = None,
+    limit: int = None
+):
+    # Returns the statement and whether its rows come newest first.
+    # Ids are monotonic per chat, so they double as the keyset cursor and
+    # every variant below is a range scan on ix_messages_chat_id_id.
+    stmt = select(models.Message).where(models.Message.chat_id == chat_id)
+
+    if after_id is not None:
+        # Refresh: only what the client hasn't seen yet, oldest first
+        stmt = stmt.where(models.Message.id > after_id)
+        return stmt.order_by(models.Message.id).limit(limit), False
+
+    if before_id is not None:
+        stmt = stmt.where(models.Message.id < before_id)
+
+    if limit is None:
+        return stmt.order_by(models.Message.id), False
+
+    # Page backwards from the newest end; callers flip it to display order
+    return stmt.order_by(models.Message.id.desc()).limit(limit), True
+
+
 def get_messages_by_chat(
     db: Session,
-    chat_id: int
+    chat_id: int,
+    before_id: int = None,
+    after_id: int = None,
+    limit: int = None
 ):
-    return (
-        db.query(models.Message)
-        .filter(models.Message.chat_id == chat_id)
-        .order_by(models.Message.created_at)
-        .all()
+    stmt, newest_first = _messages_page(chat_id, before_id, after_id, limit)
+    page = db.scalars(stmt).all()
+    page = page[::-1] if newest_first else page
+    if not archive.needs_archive(page, after_id, limit):
+        return page
+
+    through = db.scalar(archive.archived_through_statement(chat_id))
+    if not through or (after_id or 0) >= through:
+        return page
+    index = db.execute(archive.block_index_statement(chat_id, before_id, after_id)).all()
+    first_ids = archive.pick_blocks(
+        index, limit, len(page), newest_first, before_id, after_id
+    )
+    blocks = db.scalars(archive.blocks_statement(chat_id, first_ids)).all()
+    return archive.merge(chat_id, blocks, page, before_id, after_id, limit, newest_first)
+
+
+async def get_messages_by_chat_async(
+    db: AsyncSession,
+    chat_id: int,
+    before_id: int = None,
+    after_id: int = None,
+    limit: int = None
+):
+    stmt, newest_first = _messages_page(chat_id, before_id, after_id, limit)
+    page = (await db.scalars(stmt)).all()
+    page = page[::-1] if newest_first else page
+    if not archive.needs_archive(page, after_id, limit):
+        return page
+
+    # Old threads continue in the archive, below the oldest hot id
+    through = await db.scalar(archive.archived_through_statement(chat_id))
+    if not through or (after_id or 0) >= through:
+        return page
+    index = (await db.execute(
+        archive.block_index_statement(chat_id, before_id, after_id)
+    )).all()
+    first_ids = archive.pick_blocks(
+        index, limit, len(page), newest_first, before_id, after_id
+    )
+    blocks = (await db.scalars(archive.blocks_statement(chat_id, first_ids))).all()
+    return archive.merge(chat_id, blocks, page, before_id, after_id, limit, newest_first)
+
+
+# --------------------
+# PROFILES
+# --------------------
+
+def profile_to_dict(profile: models.InfluencerProfile) -> dict:
+    return {
+        "user_id": profile.user_id,
+        "name": profile.name,
+        "niche": profile.niche,
+        "followers_range": profile.followers_range,
+        "engagement": profile.engagement,
+        "bio": profile.bio,
+        "availability": profile.availability,
+        "content_types": discovery.split_content_types(profile.content_types),
+    }
+
+
+def get_profile(db: Session, user_id: int):
+    profile = (
+        db.query(models.InfluencerProfile)
+        .filter(models.InfluencerProfile.user_id == user_id)
+        .first()
+    )
+    return profile_to_dict(profile) if profile else None
+
+
+def create_or_update_profile(db: Session, profile):
+    content_types = list(dict.fromkeys(
+        t.strip() for t in profile.content_types if t.strip()
+    ))
+
+    row = (
+        db.query(models.InfluencerProfile)
+        .filter(models.InfluencerProfile.user_id == profile.user_id)
+        .first()
+    )
+    if row is None:
+        row = models.InfluencerProfile(user_id=profile.user_id)
+        db.add(row)
+
+    for field, value in profile.model_dump(exclude={"content_types"}).items():
+        setattr(row, field, value)
+    row.content_types = ",".join(content_types)
+    response_cache.versions.bump(db, ("profile", profile.user_id))
+    version = response_cache.versions.bump(db, discovery.PROFILES_VERSION)
+
+    db.commit()
+    db.refresh(row)
+
+    discovery.index.update(row, version)
+    matching.engine.update(row, version)
+    return profile_to_dict(row)
+
+
+def search_influencers(
+    db: Session,
+    filters: dict,
+    content_types: list = None,
+    match_all: bool = False,
+    before_id: int = None,
+    limit: int = 20
+):
+    # Filtering, facet counts and paging all run on the in-memory bitmap
+    # index; the database is only asked for the page of rows to return.
+    discovery.index.ensure_loaded(db)
+    ids, total, facets = discovery.index.search(
+        filters, content_types, match_all, before_id, limit
     )
 
+    by_id = {
+        p.id: p for p in
+        db.query(models.InfluencerProfile)
+        .filter(models.InfluencerProfile.id.in_(ids))
+        .all()
+    }
+    results = [
+        dict(profile_to_dict(by_id[i]), id=i) for i in ids if i in by_id
+    ]
+
+    return {
+        "total": total,
+        "results": results,
+        "facets": facets,
+        "next_before_id": ids[-1] if len(ids) == limit else None,
+    }
+
 
 # --------------------
 # ANALYTICS → AI ADAPTER
@@ -185,6 +847,7 @@ def create_product(db: Session, product):
         quantity_available=product.quantity_available,
     )
     db.add(new_product)
+    response_cache.versions.bump(db, ("products", product.vendor_id))
     db.commit()
     db.refresh(new_product)
     return new_product
@@ -197,49 +860,105 @@ def get_products(db: Session, vendor_id: int):
     )
 
 
-def create_bill(db: Session, bill):
+def reserve_stock(db: Session, quantities: dict) -> dict:
+    # Each decrement is a single conditional UPDATE, so two checkouts can
+    # never both pass the stock check. Writing first also takes SQLite's
+    # write lock up front instead of upgrading from a read lock, which
+    # would fail with "database is locked" under contention.
+    short = []
+    for product_id, quantity in quantities.items():
+        result = db.execute(
+            update(models.Product)
+            .where(
+                models.Product.id == product_id,
+                models.Product.quantity_available >= quantity,
+            )
+            .values(
+                quantity_available=models.Product.quantity_available - quantity
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            short.append(product_id)
+
+    # One IN (...) lookup for prices and names, read inside our write lock
+    products = {
+        p.id: p for p in
+        db.query(models.Product)
+        .filter(models.Product.id.in_(list(quantities)))
+        .populate_existing()
+        .all()
+    }
+
+    for product_id in quantities:
+        if product_id not in products:
+            db.rollback()
+            raise HTTPException(
+                status_code=404,
+                detail=f"Product {product_id} not found"
+            )
+
+    if short:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient stock for {products[short[0]].product_name}"
+        )
+
+    return products
+
+
+def create_bill(db: Session, bill, idempotency_key: str = None):
+    scope = f"bills:{bill.vendor_id}"
+    digest = idempotency.request_hash(bill.model_dump(mode="json"))
+    if idempotency_key:
+        seen = idempotency.lookup(db, scope, idempotency_key, digest)
+        if seen:
+            return seen
+
     total_amount = 0
     total_profit = 0
     bill_items = []
+    bill_rows = []
+    rollup_deltas = {}
+    sold_at = datetime.utcnow()
 
+    # A product may appear on several lines of the same basket
+    quantities = {}
     for item in bill.items:
-        product = (
-            db.query(models.Product)
-            .filter(models.Product.id == item.product_id)
-            .first()
-        )
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
 
-        if not product:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Product {item.product_id} not found"
-            )
+    products = reserve_stock(db, quantities)
 
-        if product.quantity_available < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {product.product_name}"
-            )
+    for item in bill.items:
+        product = products[item.product_id]
 
         item_total = item.selling_price * item.quantity
         item_profit = (
             item.selling_price - product.cost_price
         ) * item.quantity
 
-        product.quantity_available -= item.quantity
-
-        bill_item = models.Bill(
-            vendor_id=bill.vendor_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            cost_price=product.cost_price,
-            selling_price=item.selling_price,
-            profit=item_profit,
-        )
+        bill_rows.append({
+            "vendor_id": bill.vendor_id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "cost_price": product.cost_price,
+            "selling_price": item.selling_price,
+            "profit": item_profit,
+            "created_at": sold_at,
+        })
 
         total_amount += item_total
         total_profit += item_profit
 
+        delta = rollup_deltas.setdefault(
+            item.product_id, {"units": 0, "revenue": 0, "cost": 0, "profit": 0}
+        )
+        delta["units"] += item.quantity
+        delta["revenue"] += item_total
+        delta["cost"] += product.cost_price * item.quantity
+        delta["profit"] += item_profit
+
         bill_items.append({
             "product_name": product.product_name,
             "quantity": item.quantity,
@@ -247,15 +966,465 @@ def create_bill(db: Session, bill):
             "total": item_total
         })
 
-        db.add(bill_item)
+    if bill_rows:
+        db.execute(insert(models.Bill), bill_rows)
+    apply_sales_rollup(db, bill.vendor_id, rollup_deltas, sold_at.date())
 
-    db.commit()
-
-    return {
+    result = {
         "items": bill_items,
         "grand_total": total_amount,
         "total_profit": total_profit
     }
+    # Stock levels show on the product list
+    for vendor_id in {p.vendor_id for p in products.values()}:
+        response_cache.versions.bump(db, ("products", vendor_id))
+    if idempotency_key:
+        idempotency.remember(db, scope, idempotency_key, digest, result)
+        prune = idempotency.prune_statement()
+        if prune is not None:
+            db.execute(prune)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Same key committed concurrently: our stock reservation rolls
+        # back with it, so the sale is recorded once
+        db.rollback()
+        if not idempotency_key:
+            raise
+        return idempotency.lookup(db, scope, idempotency_key, digest)
+
+    return result
+
+
+EXPORT_COLUMNS = [
+    "bill_id", "created_at", "vendor_id", "product_id", "product_name",
+    "quantity", "cost_price", "selling_price", "profit",
+]
+
+
+def iter_bill_export(
+    db: Session,
+    vendor_id: int,
+    start: datetime = None,
+    end: datetime = None,
+    batch_size: int = 1000
+):
+    # Server-side cursor: rows arrive in batches of batch_size, so memory
+    # stays flat however many bills the vendor has. Product names come
+    # from the join, not per-row lookups.
+    query = (
+        select(
+            models.Bill.id.label("bill_id"),
+            models.Bill.created_at,
+            models.Bill.vendor_id,
+            models.Bill.product_id,
+            models.Product.product_name,
+            models.Bill.quantity,
+            models.Bill.cost_price,
+            models.Bill.selling_price,
+            models.Bill.profit,
+        )
+        .outerjoin(models.Product, models.Product.id == models.Bill.product_id)
+        .where(models.Bill.vendor_id == vendor_id)
+        .order_by(models.Bill.created_at, models.Bill.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    if start is not None:
+        query = query.where(models.Bill.created_at >= start)
+    if end is not None:
+        query = query.where(models.Bill.created_at < end)
+
+    result = db.execute(query)
+    try:
+        for partition in result.mappings().partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+BULK_RETRIES = 5
+
+
+def _plan_bulk_bills(bills: list, products: dict):
+    # Allocate stock to bills in order against one snapshot of the
+    # products, so a short line rejects only its own bill.
+    remaining = {pid: p.quantity_available for pid, p in products.items()}
+    now = datetime.utcnow()
+
+    results = []
+    bill_rows = []
+    taken = {}
+    rollups = {}  # (vendor_id, day) -> {product_id: delta}
+
+    for bill in bills:
+        need = {}
+        for item in bill.items:
+            need[item.product_id] = need.get(item.product_id, 0) + item.quantity
+
+        missing = [pid for pid in need if pid not in products]
+        if missing:
+            results.append({"ok": False, "error": f"Product {missing[0]} not found"})
+            continue
+        short = [pid for pid, q in need.items() if remaining[pid] < q]
+        if short:
+            name = products[short[0]].product_name
+            results.append({"ok": False, "error": f"Insufficient stock for {name}"})
+            continue
+
+        for pid, q in need.items():
+            remaining[pid] -= q
+            taken[pid] = taken.get(pid, 0) + q
+
+        sold_at = bill.sold_at or now
+        if sold_at.tzinfo is not None:
+            sold_at = sold_at.astimezone(timezone.utc).replace(tzinfo=None)
+        deltas = rollups.setdefault((bill.vendor_id, sold_at.date()), {})
+
+        grand_total = 0
+        total_profit = 0
+        for item in bill.items:
+            cost_price = products[item.product_id].cost_price
+            item_total = item.selling_price * item.quantity
+            item_profit = (item.selling_price - cost_price) * item.quantity
+            grand_total += item_total
+            total_profit += item_profit
+
+            bill_rows.append({
+                "vendor_id": bill.vendor_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "cost_price": cost_price,
+                "selling_price": item.selling_price,
+                "profit": item_profit,
+                "created_at": sold_at,
+            })
+
+            delta = deltas.setdefault(
+                item.product_id, {"units": 0, "revenue": 0, "cost": 0, "profit": 0}
+            )
+            delta["units"] += item.quantity
+            delta["revenue"] += item_total
+            delta["cost"] += cost_price * item.quantity
+            delta["profit"] += item_profit
+
+        results.append({
+            "ok": True,
+            "grand_total": grand_total,
+            "total_profit": total_profit,
+        })
+
+    return results, bill_rows, taken, rollups
+
+
+def create_bills_bulk(db: Session, bills: list) -> list:
+    # One transaction per call: a single IN (...) read, one executemany
+    # conditional stock UPDATE and one executemany INSERT. If another
+    # writer moved stock in between, the guarded UPDATE matches fewer
+    # rows and the whole chunk is re-planned against fresh numbers.
+    product_ids = list({item.product_id for b in bills for item in b.items})
+    products_table = models.Product.__table__
+    decrement = (
+        update(products_table)
+        .where(
+            products_table.c.id == bindparam("pid"),
+            products_table.c.quantity_available >= bindparam("qty"),
+        )
+        .values(quantity_available=products_table.c.quantity_available - bindparam("qty"))
+    )
+
+    for _ in range(BULK_RETRIES):
+        try:
+            products = {
+                p.id: p for p in
+                db.query(models.Product)
+                .filter(models.Product.id.in_(product_ids))
+                .populate_existing()
+                .all()
+            }
+            results, bill_rows, taken, rollups = _plan_bulk_bills(bills, products)
+
+            if taken:
+                updated = db.connection().execute(
+                    decrement,
+                    [{"pid": pid, "qty": q} for pid, q in taken.items()]
+                ).rowcount
+                if updated != len(taken):
+                    db.rollback()
+                    continue
+
+            if bill_rows:
+                db.connection().execute(insert(models.Bill.__table__), bill_rows)
+            for (vendor_id, day), deltas in rollups.items():
+                apply_sales_rollup(db, vendor_id, deltas, day)
+            for vendor_id in {products[pid].vendor_id for pid in taken}:
+                response_cache.versions.bump(db, ("products", vendor_id))
+
+            db.commit()
+            return results
+        except OperationalError:
+            # "database is locked" while upgrading to a write lock
+            db.rollback()
+
+    raise HTTPException(
+        status_code=503,
+        detail="Stock changed concurrently, retry the batch",
+        headers={"Retry-After": "1"},
+    )
+
+
+# --------------------
+# SALES ROLLUP
+# --------------------
+
+def _add_totals(db: Session, model, keys: dict, delta: dict):
+    stmt = sqlite_insert(model).values(**keys, **delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={col: getattr(model, col) + stmt.excluded[col] for col in delta},
+    )
+    db.execute(stmt)
+
+
+def apply_sales_rollup(db: Session, vendor_id: int, deltas: dict, day: date):
+    # Caller owns the transaction, so the rollups commit with the bill
+    day_total = {"units": 0, "revenue": 0, "cost": 0, "profit": 0}
+
+    for product_id, delta in deltas.items():
+        _add_totals(
+            db, models.SalesRollup,
+            {"vendor_id": vendor_id, "product_id": product_id}, delta
+        )
+        for col in day_total:
+            day_total[col] += delta[col]
+
+    if deltas:
+        _add_totals(
+            db, models.SalesDaily, {"vendor_id": vendor_id, "day": day}, day_total
+        )
+
+
+def _sales_from_bills(db: Session, vendor_id: int = None):
+    query = db.query(
+        models.Bill.vendor_id,
+        models.Bill.product_id,
+        func.sum(models.Bill.quantity).label("units"),
+        func.sum(models.Bill.quantity * models.Bill.selling_price).label("revenue"),
+        func.sum(models.Bill.quantity * models.Bill.cost_price).label("cost"),
+    ).group_by(models.Bill.vendor_id, models.Bill.product_id)
+
+    if vendor_id is not None:
+        query = query.filter(models.Bill.vendor_id == vendor_id)
+
+    return [
+        {
+            "vendor_id": row.vendor_id,
+            "product_id": row.product_id,
+            "units": row.units or 0,
+            "revenue": row.revenue or 0,
+            "cost": row.cost or 0,
+            "profit": (row.revenue or 0) - (row.cost or 0),
+        }
+        for row in query.all()
+    ]
+
+
+def rebuild_sales_rollup(db: Session, vendor_id: int = None) -> int:
+    rows = _sales_from_bills(db, vendor_id)
+
+    stale = db.query(models.SalesRollup)
+    if vendor_id is not None:
+        stale = stale.filter(models.SalesRollup.vendor_id == vendor_id)
+    stale.delete(synchronize_session=False)
+
+    if rows:
+        db.execute(sqlite_insert(models.SalesRollup), rows)
+    db.commit()
+    return len(rows)
+
+
+def rebuild_sales_daily(db: Session, vendor_id: int = None) -> int:
+    # Walks bills through ix_bills_vendor_id_created_at
+    day = func.date(models.Bill.created_at)
+    revenue = func.sum(models.Bill.quantity * models.Bill.selling_price)
+    cost = func.sum(models.Bill.quantity * models.Bill.cost_price)
+
+    query = db.query(
+        models.Bill.vendor_id,
+        day.label("day"),
+        func.sum(models.Bill.quantity).label("units"),
+        revenue.label("revenue"),
+        cost.label("cost"),
+    ).group_by(models.Bill.vendor_id, day)
+
+    stale = db.query(models.SalesDaily)
+    if vendor_id is not None:
+        query = query.filter(models.Bill.vendor_id == vendor_id)
+        stale = stale.filter(models.SalesDaily.vendor_id == vendor_id)
+
+    rows = [
+        {
+            "vendor_id": row.vendor_id,
+            "day": date.fromisoformat(row.day),
+            "units": row.units or 0,
+            "revenue": row.revenue or 0,
+            "cost": row.cost or 0,
+            "profit": (row.revenue or 0) - (row.cost or 0),
+        }
+        for row in query.all()
+    ]
+
+    stale.delete(synchronize_session=False)
+    if rows:
+        db.execute(sqlite_insert(models.SalesDaily), rows)
+    db.commit()
+    return len(rows)
+
+
+def verify_sales_rollup(db: Session, vendor_id: int = None) -> list:
+    expected = {
+        (r["vendor_id"], r["product_id"]): r
+        for r in _sales_from_bills(db, vendor_id)
+    }
+
+    query = db.query(models.SalesRollup)
+    if vendor_id is not None:
+        query = query.filter(models.SalesRollup.vendor_id == vendor_id)
+    actual = {(r.vendor_id, r.product_id): r for r in query.all()}
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        want = expected.get(key)
+        have = actual.get(key)
+        for col in ("units", "revenue", "cost", "profit"):
+            want_val = want[col] if want else 0
+            have_val = getattr(have, col) if have else 0
+            if abs(want_val - have_val) > 1e-6:
+                mismatches.append({
+                    "vendor_id": key[0],
+                    "product_id": key[1],
+                    "column": col,
+                    "expected": want_val,
+                    "actual": have_val,
+                })
+    return mismatches
+
+
+def backfill_sales_rollup(db: Session):
+    # Databases created before the rollup existed start with bills but an
+    # empty rollup; seed it once so /analytics doesn't report zeros.
+    if db.query(models.Bill).first() is None:
+        return
+    if db.query(models.SalesRollup).first() is None:
+        rebuild_sales_rollup(db)
+    if db.query(models.SalesDaily).first() is None:
+        rebuild_sales_daily(db)
+
+
+def get_sales_analytics(db: Session, vendor_id: int):
+    # Reads one pre-aggregated row per product instead of scanning bills
+    sales = (
+        db.query(
+            models.Product.product_name.label("name"),
+            func.sum(models.SalesRollup.units).label("quantity"),
+            func.sum(models.SalesRollup.revenue).label("revenue"),
+            func.sum(models.SalesRollup.cost).label("cost"),
+            func.sum(models.SalesRollup.profit).label("profit"),
+        )
+        .join(models.Product, models.Product.id == models.SalesRollup.product_id)
+        .filter(models.SalesRollup.vendor_id == vendor_id)
+        .group_by(models.Product.product_name)
+        .all()
+    )
+    sales = [row._mapping for row in sales]
+
+    return {
+        "kpis": {
+            "total_revenue": sum(s["revenue"] or 0 for s in sales),
+            "total_cost": sum(s["cost"] or 0 for s in sales),
+            "total_profit": sum(s["profit"] or 0 for s in sales),
+            "total_units_sold": sum(s["quantity"] or 0 for s in sales),
+            "product_count": len(sales),
+        },
+        "sales": sales,
+    }
+
+
+# SQL expressions mapping sales_daily.day onto the first day of its bucket
+BUCKETS = {
+    "day": lambda day: day,
+    "week": lambda day: func.date(
+        day,
+        func.printf("-%d days", (cast(func.strftime("%w", day), Integer) + 6) % 7)
+    ),
+    "month": lambda day: func.strftime("%Y-%m-01", day),
+}
+
+
+def _bucket_starts(start: date, end: date, bucket: str) -> list:
+    if bucket == "week":
+        start -= timedelta(days=start.weekday())
+    elif bucket == "month":
+        start = start.replace(day=1)
+
+    starts = []
+    while start <= end:
+        starts.append(start.isoformat())
+        if bucket == "day":
+            start += timedelta(days=1)
+        elif bucket == "week":
+            start += timedelta(days=7)
+        elif start.month == 12:
+            start = start.replace(year=start.year + 1, month=1)
+        else:
+            start = start.replace(month=start.month + 1)
+    return starts
+
+
+def get_sales_timeseries(
+    db: Session,
+    vendor_id: int,
+    start: date,
+    end: date,
+    bucket: str
+):
+    # Bucketing happens in SQL over at most one row per day, so a year of
+    # data is a single range scan of ~365 primary-key rows.
+    key = BUCKETS[bucket](models.SalesDaily.day).label("bucket")
+    rows = (
+        db.query(
+            key,
+            func.sum(models.SalesDaily.units).label("units"),
+            func.sum(models.SalesDaily.revenue).label("revenue"),
+            func.sum(models.SalesDaily.cost).label("cost"),
+            func.sum(models.SalesDaily.profit).label("profit"),
+        )
+        .filter(
+            models.SalesDaily.vendor_id == vendor_id,
+            models.SalesDaily.day >= start,
+            models.SalesDaily.day <= end,
+        )
+        .group_by(key)
+        .all()
+    )
+    found = {
+        str(row.bucket): dict(row._mapping, bucket=str(row.bucket))
+        for row in rows
+    }
+
+    # Gap filling iterates over the bucket axis, never over bill rows
+    empty = {"units": 0, "revenue": 0, "cost": 0, "profit": 0}
+    series = [
+        found.get(b) or {"bucket": b, **empty}
+        for b in _bucket_starts(start, end, bucket)
+    ]
+
+    return {
+        "vendor_id": vendor_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        "series": series,
+    }
 
 
 
@@ -298,13 +1467,10 @@ Return STRICT JSON:
 }}
 """
 
-def generate_marketing_insights(ai_analytics: dict) -> str:
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(
-        build_marketing_prompt(ai_analytics),
-        generation_config={"temperature": 0.4}
-    )
-    return response.text
+def generate_marketing_insights(ai_analytics: dict, timeout: float = None) -> str:
+    provider = ai.get_provider()
+    with metrics.span(f"ai.{ai.get_settings().provider}.generate"):
+        return provider.generate(build_marketing_prompt(ai_analytics), timeout=timeout)
 
 def safe_parse_ai_response(text: str):
     try:
@@ -323,3 +1489,69 @@ def safe_parse_ai_response(text: str):
             "error": "Invalid AI response",
             "raw": text
         }
+
+
+def get_marketing_insights(
+    db: Session,
+    ai_analytics: dict,
+    timeout: float = None
+) -> dict:
+    # Unchanged sales produce the same fingerprint, so repeat requests skip
+    # Gemini entirely; unparseable replies are returned but never cached.
+    return insight_cache.cache.get_or_compute(
+        db,
+        insight_cache.fingerprint(ai.get_settings().fingerprint, ai_analytics),
+        lambda: safe_parse_ai_response(
+            generate_marketing_insights(ai_analytics, timeout=timeout)
+        ),
+        cacheable=lambda result: "error" not in result,
+    )
+
+
+# --------------------
+# COMPOSITE VIEWS
+# --------------------
+# Everything a page needs on first load in one response. Each part is a
+# single query, so the cost does not grow with the number of rows.
+
+def get_session_bootstrap(db: Session, email: str, role: str) -> dict:
+    user = create_or_get_user(db, email, role)
+    return {
+        "user": user,
+        "tokens": user.tokens,
+        "profile": get_profile(db, user.id),
+    }
+
+
+def get_chat_view(db: Session, chat_id: int, user_id: int, limit: int = None):
+    chat = db.get(models.Chat, chat_id)
+    if chat is None or user_id not in (chat.vendor_id, chat.influencer_id):
+        return None
+
+    counterpart_id = chat.influencer_id if user_id == chat.vendor_id else chat.vendor_id
+    last_read = db.scalar(
+        select(models.ChatReadMarker.last_read_message_id).where(
+            models.ChatReadMarker.chat_id == chat_id,
+            models.ChatReadMarker.user_id == user_id,
+        )
+    )
+    return {
+        "chat": chat,
+        "campaign": db.get(models.Campaign, chat.campaign_id),
+        "counterpart": db.get(models.User, counterpart_id),
+        "counterpart_profile": get_profile(db, counterpart_id),
+        "last_read_message_id": last_read or 0,
+        "messages": get_messages_by_chat(db, chat_id, limit=limit),
+    }
+
+
+def get_vendor_dashboard(db: Session, vendor_id: int):
+    vendor = db.get(models.User, vendor_id)
+    if vendor is None:
+        return None
+    return {
+        "vendor": vendor,
+        "products": get_products(db, vendor_id),
+        "campaigns": get_all_campaigns(db, vendor_id=vendor_id),
+        "analytics": get_sales_analytics(db, vendor_id),
+    }
@@ -1,12 +1,107 @@
-from sqlalchemy import create_engine
+import asyncio
+import os
+import weakref
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Connections per engine. The sync pool serves Starlette's threadpool
+# (40 threads), so it should be close to that to avoid queueing on the pool
+# rather than on SQLite itself.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+# WAL lets readers run alongside the single writer; with it, NORMAL only
+# risks the last transactions on power loss, never corruption. A busy
+# timeout makes writers queue instead of failing with "database is locked".
+# auto_vacuum only takes effect on a new file (or after a VACUUM); it lets
+# archive.py hand space freed by archived messages back to the filesystem.
+SQLITE_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000")),
+    "temp_store": "MEMORY",
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
 )
+event.listen(engine, "connect", _set_sqlite_pragmas)
 
 SessionLocal = sessionmaker(bind=engine)
 
+# Same database through aiosqlite, for routes that await instead of
+# holding a threadpool worker for the whole request
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+_async_write_locks = weakref.WeakKeyDictionary()  # event loop -> Lock
+
+
+def async_write_lock() -> asyncio.Lock:
+    # SQLite has one writer; queueing async writers on a lock is cheaper
+    # than having the losers poll the busy handler with backing-off sleeps.
+    # asyncio locks belong to one loop, hence one per loop.
+    loop = asyncio.get_running_loop()
+    lock = _async_write_locks.get(loop)
+    if lock is None:
+        lock = _async_write_locks[loop] = asyncio.Lock()
+    return lock
+
 Base = declarative_base()
+
+
+def _add_missing_columns():
+    # Same gap as indexes below: create_all() never alters an existing
+    # table. New columns are nullable, so a plain ADD COLUMN is enough.
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'
+                ))
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+    # create_all() only emits CREATE INDEX together with CREATE TABLE, so
+    # indexes added to a model after app.db was first created would never
+    # be built on an existing database.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+from db import AsyncSessionLocal, async_write_lock
+
+# Off by default: each message then commits on its own, as before
+ENABLED = os.getenv("MESSAGE_GROUP_COMMIT", "0") == "1"
+MAX_BATCH = int(os.getenv("MESSAGE_BATCH_MAX", "64"))
+# How long a lone write waits for company. Under load batches fill up
+# anyway while the previous one commits, so this only matters when idle.
+MAX_WAIT_MS = float(os.getenv("MESSAGE_BATCH_WAIT_MS", "2"))
+
+
+class GroupCommitWriter:
+    """Funnels single-row writes into one transaction per batch.
+
+    A single task per event loop drains the queue and hands each batch to
+    write_batch(session, items), which must commit and return one result
+    (or exception) per item. submit() only returns once the batch holding
+    its item has committed, so success still means durable.
+    """
+
+    def __init__(
+        self,
+        write_batch,
+        session_factory=AsyncSessionLocal,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self._write_batch = write_batch
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._task = None
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_wait and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        try:
+            async with async_write_lock():
+                async with self._session_factory() as db:
+                    results = await self._write_batch(db, [item for item, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                results = [exc]
+            else:
+                # One bad item must not fail the rest: retry each alone
+                for entry in batch:
+                    await self._flush([entry])
+                return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():   # caller went away; the row is still written
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+
+import models
+
+# Long enough to cover client retries and offline resends; expired keys
+# are pruned as new ones are written, which keeps the table bounded.
+TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+PRUNE_EVERY = 500
+
+_lock = threading.Lock()
+_writes = 0
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+
+
+def _select(scope: str, key: str):
+    return select(models.IdempotencyKey).where(
+        models.IdempotencyKey.scope == scope,
+        models.IdempotencyKey.key == key,
+    )
+
+
+def conflict() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail="Idempotency-Key was already used with a different request"
+    )
+
+
+def _replay(row, digest: str):
+    if row is None:
+        return None
+    if row.request_hash != digest:
+        raise conflict()
+    return json.loads(row.response)
+
+
+def lookup(db, scope: str, key: str, digest: str):
+    """The stored response for this key, or None if it is new."""
+    return _replay(db.scalars(_select(scope, key)).first(), digest)
+
+
+async def lookup_async(db, scope: str, key: str, digest: str):
+    return _replay((await db.scalars(_select(scope, key))).first(), digest)
+
+
+def remember(db, scope: str, key: str, digest: str, response: dict):
+    # Added to the caller's transaction, so the response is stored if and
+    # only if the write commits. A concurrent retry that got there first
+    # makes the commit fail on the primary key instead.
+    db.add(models.IdempotencyKey(
+        scope=scope,
+        key=key,
+        request_hash=digest,
+        response=json.dumps(response, default=str),
+    ))
+
+
+def prune_statement():
+    """DELETE for expired keys, due every PRUNE_EVERY writes; else None."""
+    global _writes
+    with _lock:
+        _writes += 1
+        if _writes % PRUNE_EVERY:
+            return None
+    cutoff = datetime.utcnow() - timedelta(seconds=TTL_SECONDS)
+    return delete(models.IdempotencyKey).where(
+        models.IdempotencyKey.created_at < cutoff
+    )
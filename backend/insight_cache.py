@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+import models
+
+# Insights only change when the vendor's numbers do, so a day is a safe
+# default; both limits can be tuned per deployment.
+TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "256"))
+
+
+def fingerprint(model_name: str, ai_analytics: dict) -> str:
+    # sort_keys makes the hash independent of dict ordering
+    payload = json.dumps(
+        {"model": model_name, "analytics": ai_analytics},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class InsightCache:
+    """Two-tier (memory LRU + SQLite) cache with single-flight misses."""
+
+    def __init__(self, ttl_seconds: int = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}             # key -> Future
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "memory_entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(self, db: Session, key: str, compute, cacheable=None):
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                leader = True
+            else:
+                self._counters["coalesced"] += 1
+                leader = False
+
+        # Identical concurrent requests wait on the leader's upstream call
+        if not leader:
+            return pending.result()
+
+        try:
+            value = self._get_db(db, key)
+            if value is None:
+                self._count("misses")
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self._put_db(db, key, value)
+                    self._put_memory(key, value)
+            else:
+                self._count("db_hits")
+                self._put_memory(key, value)
+            pending.set_result(value)
+            return value
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # --------------------
+    # MEMORY TIER
+    # --------------------
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return value
+
+    def _put_memory(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --------------------
+    # SQLITE TIER
+    # --------------------
+
+    def _get_db(self, db: Session, key: str):
+        row = db.get(models.AiInsightCache, key)
+        if row is None:
+            return None
+        if row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+            db.delete(row)
+            db.commit()
+            return None
+        return json.loads(row.payload)
+
+    def _put_db(self, db: Session, key: str, value):
+        db.merge(models.AiInsightCache(
+            key=key,
+            payload=json.dumps(value),
+            created_at=datetime.utcnow(),
+        ))
+        db.commit()
+
+
+cache = InsightCache()
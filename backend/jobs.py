@@ -0,0 +1,213 @@
+import json
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import models
+import crud
+from db import SessionLocal
+
+# Gemini calls are slow but cheap on CPU; a small pool keeps them off the
+# request threadpool without letting a burst of clicks fan out upstream.
+WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("AI_JOB_MAX_PENDING", "50"))
+TIMEOUT_SECONDS = float(os.getenv("AI_JOB_TIMEOUT_SECONDS", "60"))
+# A running job whose lease ran out belongs to a dead worker and may be
+# taken over. Longer than a call can take, so a live worker never loses it.
+LEASE_SECONDS = float(os.getenv("AI_JOB_LEASE_SECONDS", str(TIMEOUT_SECONDS * 2)))
+
+# Identifies this process among the workers sharing the database
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_to_dict(job: models.AiJob) -> dict:
+    return {
+        "job_id": job.id,
+        "vendor_id": job.vendor_id,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+class JobRunner:
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="ai-job"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _active(self, db, vendor_id: int):
+        return (
+            db.query(models.AiJob)
+            .filter(
+                models.AiJob.vendor_id == vendor_id,
+                models.AiJob.status.in_([QUEUED, RUNNING]),
+            )
+            .populate_existing()
+            .first()
+        )
+
+    def enqueue(self, db, vendor_id: int, ai_analytics: dict) -> models.AiJob:
+        # A vendor mashing the button shares the job already in flight
+        active = self._active(db, vendor_id)
+        if active:
+            return active
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=503,
+                    detail="AI insight queue is full, try again shortly",
+                    headers={"Retry-After": "5"},
+                )
+            self._pending += 1
+
+        # Two enqueues racing past the check above (in this worker or
+        # another) meet on ux_ai_jobs_vendor_active; the loser shares the
+        # winner's job
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        db.execute(
+            sqlite_insert(models.AiJob)
+            .values(
+                id=job_id,
+                vendor_id=vendor_id,
+                status=QUEUED,
+                payload=json.dumps(ai_analytics),
+                created_at=now,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(
+                index_elements=["vendor_id"],
+                index_where=models.ux_ai_jobs_vendor_active.dialect_options["sqlite"]["where"],
+            )
+        )
+        db.commit()
+        job = db.get(models.AiJob, job_id)
+
+        if job is None:
+            with self._lock:
+                self._pending -= 1
+            # The winner's job may already have finished (an insight-cache
+            # hit takes milliseconds), so share whichever job is newest
+            return self._active(db, vendor_id) or self._latest(db, vendor_id)
+
+        self._pool.submit(self._run, job_id)
+        return job
+
+    def _latest(self, db, vendor_id: int):
+        return (
+            db.query(models.AiJob)
+            .filter(models.AiJob.vendor_id == vendor_id)
+            .order_by(models.AiJob.created_at.desc())
+            .populate_existing()
+            .first()
+        )
+
+    def recover(self):
+        # Jobs interrupted by a restart still have their input persisted.
+        # Every worker runs this at startup; running jobs are only taken
+        # over once their lease has expired, and _claim lets exactly one
+        # worker have each queued job.
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            ids = [
+                job_id for (job_id,) in
+                db.query(models.AiJob.id)
+                .filter(or_(
+                    models.AiJob.status == QUEUED,
+                    (models.AiJob.status == RUNNING) & or_(
+                        models.AiJob.lease_expires_at.is_(None),
+                        models.AiJob.lease_expires_at < now,
+                    ),
+                ))
+                .all()
+            ]
+        with self._lock:
+            self._pending += len(ids)
+        for job_id in ids:
+            self._pool.submit(self._run, job_id)
+
+    def _claim(self, db, job_id: str) -> bool:
+        # Conditional UPDATE: of several workers holding the same job id,
+        # only one moves it to running
+        now = datetime.utcnow()
+        claimed = (
+            db.query(models.AiJob)
+            .filter(
+                models.AiJob.id == job_id,
+                or_(
+                    models.AiJob.status == QUEUED,
+                    (models.AiJob.status == RUNNING) & or_(
+                        models.AiJob.lease_expires_at.is_(None),
+                        models.AiJob.lease_expires_at < now,
+                    ),
+                ),
+            )
+            .update({
+                "status": RUNNING,
+                "owner": WORKER_ID,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        return claimed == 1
+
+    def _run(self, job_id: str):
+        try:
+            with SessionLocal() as db:
+                if not self._claim(db, job_id):
+                    return
+                job = db.get(models.AiJob, job_id)
+
+                try:
+                    result = crud.get_marketing_insights(
+                        db, json.loads(job.payload), timeout=TIMEOUT_SECONDS
+                    )
+                except Exception as exc:
+                    db.rollback()
+                    self._finish(db, job_id, status=FAILED, error=str(exc) or type(exc).__name__)
+                    return
+
+                self._finish(db, job_id, status=DONE, result=json.dumps(result))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _finish(self, db, job_id: str, **fields):
+        # Only while we still hold the job: if our lease lapsed and another
+        # worker took over, its outcome stands
+        db.query(models.AiJob).filter(
+            models.AiJob.id == job_id,
+            models.AiJob.owner == WORKER_ID,
+            models.AiJob.status == RUNNING,
+        ).update(
+            {**fields, "lease_expires_at": None, "updated_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+
+
+runner = JobRunner()
@@ -1,31 +1,61 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, Request
-from fastapi.responses import Response
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, Request, Query, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
-from typing import List
-import os
+from typing import List, Optional, Literal
+from datetime import date, datetime, time, timedelta
+import io
+import csv
+import json
+import asyncio
 from dotenv import load_dotenv
-import google.generativeai as genai
-
-import models, schemas, crud
-from db import engine, SessionLocal
 
 # --------------------
 # ENV SETUP
 # --------------------
+# Before the app modules below, which read their settings at import
 BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(BASE_DIR / ".env")
 
+import models, schemas, crud, realtime, insight_cache, response_cache, jobs, bulk, matching, metrics
+import compression, serialization, archive, admission
+from db import engine, async_engine, SessionLocal, AsyncSessionLocal, async_write_lock, init_db
+
 # --------------------
 # DB + APP SETUP
 # --------------------
-models.Base.metadata.create_all(bind=engine)
+init_db()
+
+with SessionLocal() as _db:
+    crud.backfill_sales_rollup(_db)
+    crud.backfill_chat_activity(_db)
+    crud.ensure_campaign_search(_db)
 
-app = FastAPI()
+jobs.runner.recover()
+archive.start_background()
+
+# Routes returning plain dicts get orjson for the final dump; list
+# routes skip jsonable_encoder altogether via serialization.respond
+app = FastAPI(default_response_class=ORJSONResponse)
 router = APIRouter()
 
+# --------------------
+# COMPRESSION
+# --------------------
+# Added first so it sits innermost; the metrics middleware then times
+# the compression as part of each request
+app.add_middleware(compression.CompressionMiddleware)
+
+# --------------------
+# ADMISSION CONTROL
+# --------------------
+# Inside CORS so rejections still carry CORS headers; per-route classes
+# are set with @admission.classify below
+app.add_middleware(admission.AdmissionMiddleware)
+
 # --------------------
 # CORS
 # --------------------
@@ -42,6 +72,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------
+# METRICS
+# --------------------
+# Added after CORS so it is outermost and times the whole stack
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
+metrics.registry.add_gauges(lambda: {
+    **{f"response_cache_{k}": v for k, v in response_cache.cache.stats().items()},
+    **{f"ai_insight_cache_{k}": v for k, v in insight_cache.cache.stats().items()},
+    "ai_jobs_pending": jobs.runner.pending,
+    **{
+        f"admission_in_flight_{name}": admission.controller.store.in_flight().get(name, 0)
+        for name in admission.controller.policies
+    },
+})
+
+@app.get("/metrics")
+@admission.classify(None)
+def prometheus_metrics():
+    return Response(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.options("/{path:path}")
 def options_handler(path: str, request: Request):
     return Response(status_code=200)
@@ -56,6 +112,12 @@ def get_db():
     finally:
         db.close()
 
+# High-traffic chat routes await the database on the event loop instead
+# of each holding a threadpool worker
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # --------------------
 # USERS
 # --------------------
@@ -63,6 +125,13 @@ def get_db():
 def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_or_get_user(db, user.email, user.role)
 
+@app.post("/session/bootstrap", response_model=schemas.SessionOut)
+def session_bootstrap(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    # POST /users, GET /tokens and GET /profile in one round trip
+    return serialization.respond(
+        schemas.SESSION, crud.get_session_bootstrap(db, user.email, user.role)
+    )
+
 # --------------------
 # CAMPAIGNS
 # --------------------
@@ -75,9 +144,46 @@ def create_campaign(campaign: schemas.CampaignCreate, db: Session = Depends(get_
         campaign.description,
     )
 
-@app.get("/campaigns")
-def get_campaigns(db: Session = Depends(get_db)):
-    return crud.get_all_campaigns(db)
+@app.get("/campaigns", response_model=List[schemas.CampaignOut])
+def get_campaigns(
+    request: Request,
+    vendor_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    q: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    def build():
+        if q and q.strip():
+            return crud.search_campaigns(db, q, limit=limit or 20, offset=offset)
+        return crud.get_all_campaigns(
+            db, vendor_id=vendor_id, before_id=before_id, limit=limit
+        )
+
+    return response_cache.cache.respond(
+        request, db, ("campaigns",), build, schemas.CAMPAIGN_LIST
+    )
+
+@app.get("/campaigns/{campaign_id}")
+def get_campaign(campaign_id: int, db: Session = Depends(get_db)):
+    campaign = crud.get_campaign(db, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+@app.get("/campaigns/{campaign_id}/matches", response_model=List[schemas.CampaignMatchOut])
+def get_campaign_matches(
+    campaign_id: int,
+    limit: int = Query(10, ge=1, le=matching.MAX_MATCHES),
+    db: Session = Depends(get_db)
+):
+    campaign = crud.get_campaign(db, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return serialization.respond(
+        schemas.CAMPAIGN_MATCH_LIST, crud.get_campaign_matches(db, campaign, limit)
+    )
 
 # --------------------
 # CHATS
@@ -91,51 +197,226 @@ def create_or_get_chat(chat: schemas.ChatCreate, db: Session = Depends(get_db)):
         chat.influencer_id,
     )
 
-@app.get("/chats/user/{user_id}")
+@app.get("/chats/user/{user_id}", response_model=List[schemas.ChatOut])
 def get_user_chats(user_id: int, db: Session = Depends(get_db)):
-    return crud.get_chats_by_user(db, user_id)
+    return serialization.respond(
+        schemas.CHAT_LIST, crud.get_chats_by_user(db, user_id)
+    )
+
+@app.get("/chats/user/{user_id}/inbox", response_model=List[schemas.InboxChatOut])
+async def get_inbox(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    return serialization.respond(
+        schemas.INBOX, await crud.get_inbox_async(db, user_id)
+    )
+
+@app.get("/chats/{chat_id}/view", response_model=schemas.ChatViewOut)
+def chat_view(
+    chat_id: int,
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    view = crud.get_chat_view(db, chat_id, user_id, limit=limit)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return serialization.respond(schemas.CHAT_VIEW, view)
+
+@app.post("/chats/{chat_id}/read")
+async def mark_chat_read(
+    chat_id: int,
+    read: schemas.ChatRead,
+    db: AsyncSession = Depends(get_async_db)
+):
+    chat = await db.get(models.Chat, chat_id)
+    if chat is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    message_id = read.last_read_message_id or chat.last_message_id or 0
+    async with async_write_lock():
+        await crud.mark_chat_read_async(db, chat_id, read.user_id, message_id)
+        await db.commit()
+    return {"chat_id": chat_id, "user_id": read.user_id, "last_read_message_id": message_id}
 
 # --------------------
 # MESSAGES
 # --------------------
 @app.post("/messages", response_model=schemas.MessageOut)
-def send_message(message: schemas.MessageCreate, db: Session = Depends(get_db)):
-    return crud.create_message(
+async def send_message(
+    message: schemas.MessageCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await crud.create_message_async(
         db,
         message.chat_id,
         message.sender_id,
         message.text,
+        idempotency_key=idempotency_key,
     )
 
 @app.get("/messages/{chat_id}", response_model=List[schemas.MessageOut])
-def get_messages(chat_id: int, db: Session = Depends(get_db)):
-    return crud.get_messages_by_chat(db, chat_id)
+async def get_messages(
+    chat_id: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if before_id is not None and after_id is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Use either before_id or after_id, not both"
+        )
+
+    messages = await crud.get_messages_by_chat_async(
+        db,
+        chat_id,
+        before_id=before_id,
+        after_id=after_id,
+        limit=limit,
+    )
+    return serialization.respond(schemas.MESSAGE_LIST, messages)
+
+# --------------------
+# LIVE CHAT (WEBSOCKET)
+# --------------------
+@app.websocket("/ws/chats/{chat_id}")
+async def chat_socket(
+    websocket: WebSocket,
+    chat_id: int,
+    after_id: Optional[int] = None
+):
+    await websocket.accept()
+
+    # Subscribe before reading the backlog so nothing committed in
+    # between is missed; duplicates are filtered by id below.
+    sub = realtime.hub.subscribe(chat_id)
+    last_id = after_id or 0
+
+    try:
+        if after_id is not None:
+            async with AsyncSessionLocal() as db:
+                backlog = await crud.get_messages_by_chat_async(
+                    db, chat_id, after_id=after_id
+                )
+                backlog = schemas.MESSAGE_LIST.dump_python(
+                    schemas.MESSAGE_LIST.validate_python(backlog, from_attributes=True),
+                    mode="json",
+                )
+
+            for payload in backlog:
+                await websocket.send_json(payload)
+                last_id = payload["id"]
+
+        async def pump():
+            nonlocal last_id
+            while True:
+                payload = await sub.queue.get()
+                if payload is None:
+                    # Fell too far behind; client reconnects with after_id
+                    await websocket.close(code=1013)
+                    return
+                if payload["id"] <= last_id:
+                    continue
+                await websocket.send_json(payload)
+                last_id = payload["id"]
+
+        async def drain():
+            # Inbound frames are ignored; this only notices the disconnect
+            while True:
+                await websocket.receive_text()
+
+        tasks = [asyncio.create_task(pump()), asyncio.create_task(drain())]
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        for task in done:
+            exc = task.exception()
+            if exc and not isinstance(exc, WebSocketDisconnect):
+                raise exc
+    except WebSocketDisconnect:
+        pass
+    finally:
+        realtime.hub.unsubscribe(sub)
 
 # --------------------
 # TOKENS
 # --------------------
 @app.get("/tokens/{user_id}")
-def get_tokens(user_id: int, db: Session = Depends(get_db)):
-    return {"tokens": crud.get_user_tokens(db, user_id)}
+async def get_tokens(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    return {"tokens": await crud.get_user_tokens_async(db, user_id)}
 
 @app.post("/tokens/deduct")
-def deduct_user_tokens(user_id: int, amount: int, db: Session = Depends(get_db)):
-    result = crud.deduct_tokens(db, user_id, amount)
+def deduct_user_tokens(
+    user_id: int,
+    amount: int,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db)
+):
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be positive")
+
+    result = crud.deduct_tokens(db, user_id, amount, idempotency_key=idempotency_key)
     if result == "INSUFFICIENT":
         return {"error": "Not enough tokens"}
     return {"tokens": result}
 
+@app.get("/tokens/{user_id}/history", response_model=schemas.TokenHistoryOut)
+def token_history(
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    entries = crud.get_token_history(db, user_id, before_id=before_id, limit=limit)
+    return serialization.respond(schemas.TOKEN_HISTORY, {
+        "entries": entries,
+        "next_before_id": entries[-1].id if len(entries) == limit else None,
+    })
+
 # --------------------
 # PROFILES
 # --------------------
-@app.get("/profile/{user_id}")
-def get_profile(user_id: int, db: Session = Depends(get_db)):
-    return crud.get_profile(db, user_id)
+@app.get("/profile/{user_id}", response_model=Optional[schemas.ProfileOut])
+def get_profile(user_id: int, request: Request, db: Session = Depends(get_db)):
+    return response_cache.cache.respond(
+        request, db, ("profile", user_id), lambda: crud.get_profile(db, user_id),
+        schemas.PROFILE,
+    )
 
 @app.post("/profile")
 def save_profile(profile: schemas.ProfileCreate, db: Session = Depends(get_db)):
     return crud.create_or_update_profile(db, profile)
 
+@app.get("/influencers/search", response_model=schemas.InfluencerSearchOut)
+def search_influencers(
+    niche: List[str] = Query([]),
+    followers_range: List[str] = Query([]),
+    engagement: List[str] = Query([]),
+    availability: List[str] = Query([]),
+    content_types: List[str] = Query([]),
+    content_match: Literal["any", "all"] = "any",
+    before_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    results = crud.search_influencers(
+        db,
+        {
+            "niche": niche,
+            "followers_range": followers_range,
+            "engagement": engagement,
+            "availability": availability,
+        },
+        content_types=content_types,
+        match_all=content_match == "all",
+        before_id=before_id,
+        limit=limit,
+    )
+    return serialization.respond(schemas.INFLUENCER_SEARCH, results)
+
 # --------------------
 # PRODUCTS
 # --------------------
@@ -143,9 +424,20 @@ def save_profile(profile: schemas.ProfileCreate, db: Session = Depends(get_db)):
 def add_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     return crud.create_product(db, product)
 
-@app.get("/products")
-def get_products(vendor_id: int, db: Session = Depends(get_db)):
-    return crud.get_products(db, vendor_id)
+@app.get("/products", response_model=List[schemas.ProductOut])
+def get_products(vendor_id: int, request: Request, db: Session = Depends(get_db)):
+    return response_cache.cache.respond(
+        request, db, ("products", vendor_id), lambda: crud.get_products(db, vendor_id),
+        schemas.PRODUCT_LIST,
+    )
+
+@app.get("/vendor/{vendor_id}/dashboard", response_model=schemas.VendorDashboardOut)
+def vendor_dashboard(vendor_id: int, db: Session = Depends(get_db)):
+    # Products, campaigns and sales analytics for the vendor pages at once
+    dashboard = crud.get_vendor_dashboard(db, vendor_id)
+    if dashboard is None:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    return serialization.respond(schemas.VENDOR_DASHBOARD, dashboard)
 
 # --------------------
 # BILLS (FIXED)
@@ -153,64 +445,144 @@ def get_products(vendor_id: int, db: Session = Depends(get_db)):
 @app.post("/bills", response_model=schemas.BillOut)
 def create_bill(
     bill: schemas.BillCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     try:
-        return crud.create_bill(db, bill)
+        return crud.create_bill(db, bill, idempotency_key=idempotency_key)
     except Exception:
         db.rollback()
         raise
 
+@app.post("/bills/bulk")
+async def create_bills_bulk(request: Request):
+    # NDJSON: one BillCreate object (plus optional sold_at) per line.
+    # CSV: vendor_id,product_id,quantity,selling_price[,bill_ref,sold_at]
+    fmt = bulk.detect_format(request.headers.get("content-type", ""))
+    return await bulk.import_bills(request.stream(), fmt, run_in_threadpool)
+
+def _export_lines(rows, fmt: str):
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(crud.EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    for batch in rows:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(
+                [row[col] for col in crud.EXPORT_COLUMNS] for row in batch
+            )
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(dict(row, created_at=row["created_at"].isoformat())) + "\n"
+                for row in batch
+            )
+
+
+@app.get("/bills/export")
+def export_bills(
+    vendor_id: int,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    format: Literal["csv", "ndjson"] = "csv"
+):
+    def generate():
+        # Own session: it must stay open until the last chunk is sent
+        with SessionLocal() as db:
+            rows = crud.iter_bill_export(
+                db,
+                vendor_id,
+                start=datetime.combine(start, time.min) if start else None,
+                end=datetime.combine(end + timedelta(days=1), time.min) if end else None,
+            )
+            yield from _export_lines(rows, format)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"bills-{vendor_id}.{format}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # --------------------
 # ANALYTICS
 # --------------------
-@app.get("/analytics/{vendor_id}")
+@app.get("/analytics/{vendor_id}", response_model=schemas.AnalyticsOut)
 def analytics(vendor_id: int, db: Session = Depends(get_db)):
-    sales = db.execute(
-        text("""
-            SELECT 
-                p.product_name AS name,
-                SUM(b.quantity) AS quantity,
-                SUM(b.quantity * b.selling_price) AS revenue,
-                SUM(b.quantity * b.cost_price) AS cost,
-                SUM(b.quantity * b.selling_price)
-                - SUM(b.quantity * b.cost_price) AS profit
-            FROM bills b
-            JOIN products p ON p.id = b.product_id
-            WHERE b.vendor_id = :vendor_id
-            GROUP BY p.product_name
-        """),
-        {"vendor_id": vendor_id}
-    ).mappings().all()
-
-    total_revenue = sum(s["revenue"] or 0 for s in sales)
-    total_cost = sum(s["cost"] or 0 for s in sales)
-    total_profit = sum(s["profit"] or 0 for s in sales)
-    total_units = sum(s["quantity"] or 0 for s in sales)
+    return serialization.respond(
+        schemas.ANALYTICS, crud.get_sales_analytics(db, vendor_id)
+    )
 
-    return {
-        "kpis": {
-            "total_revenue": total_revenue,
-            "total_cost": total_cost,
-            "total_profit": total_profit,
-            "total_units_sold": total_units,
-            "product_count": len(sales),
-        },
-        "sales": sales,
-    }
+@app.get("/analytics/{vendor_id}/timeseries", response_model=schemas.TimeseriesOut)
+def analytics_timeseries(
+    vendor_id: int,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    bucket: Literal["day", "week", "month"] = "day",
+    db: Session = Depends(get_db)
+):
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    if (end - start).days > 366 * 5:
+        raise HTTPException(status_code=400, detail="Date range too large")
+
+    return serialization.respond(
+        schemas.TIMESERIES,
+        crud.get_sales_timeseries(db, vendor_id, start, end, bucket)
+    )
 
 # --------------------
 # AI MARKETING INSIGHTS
 # --------------------
 @app.get("/analytics/{vendor_id}/marketing")
+@admission.classify("ai")
 def marketing_insights(vendor_id: int, db: Session = Depends(get_db)):
-    raw_analytics = analytics(vendor_id, db)
+    raw_analytics = crud.get_sales_analytics(db, vendor_id)
 
     ai_data = crud.extract_ai_analytics(raw_analytics)
     crud.validate_ai_analytics(ai_data)
 
-    ai_text = crud.generate_marketing_insights(ai_data)
-
     return {
-        "marketing_insights": crud.safe_parse_ai_response(ai_text)
+        "marketing_insights": crud.get_marketing_insights(db, ai_data)
     }
+
+@app.post("/analytics/{vendor_id}/marketing/jobs", status_code=202)
+@admission.classify("ai")
+def enqueue_marketing_insights(vendor_id: int, db: Session = Depends(get_db)):
+    ai_data = crud.extract_ai_analytics(crud.get_sales_analytics(db, vendor_id))
+    crud.validate_ai_analytics(ai_data)
+
+    job = jobs.runner.enqueue(db, vendor_id, ai_data)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/analytics/{vendor_id}/marketing/jobs/{job_id}")
+def marketing_insights_job(vendor_id: int, job_id: str, db: Session = Depends(get_db)):
+    job = db.get(models.AiJob, job_id)
+    if job is None or job.vendor_id != vendor_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_to_dict(job)
+
+@app.get("/ai/insights/cache")
+def insight_cache_stats():
+    return insight_cache.cache.stats()
+
+@app.get("/cache/responses")
+def response_cache_stats():
+    return response_cache.cache.stats()
+
+@app.get("/archive/runs")
+def archive_runs(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    runs = (
+        db.query(models.ArchiveRun)
+        .order_by(models.ArchiveRun.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [archive.run_to_dict(run) for run in runs]
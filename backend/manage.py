@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+
+import archive
+import crud
+from db import SessionLocal, init_db
+
+
+# --------------------
+# COMMANDS
+# --------------------
+
+def rebuild_rollup(args):
+    with SessionLocal() as db:
+        count = crud.rebuild_sales_rollup(db, args.vendor_id)
+        days = crud.rebuild_sales_daily(db, args.vendor_id)
+    print(f"Rebuilt {count} rollup rows and {days} daily rows")
+
+
+def verify_rollup(args):
+    with SessionLocal() as db:
+        mismatches = crud.verify_sales_rollup(db, args.vendor_id)
+
+    for m in mismatches:
+        print(json.dumps(m))
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+def archive_messages(args):
+    if args.full_vacuum:
+        reclaimed = archive.full_vacuum()
+        print(f"VACUUM reclaimed {reclaimed} bytes; incremental vacuum is now enabled")
+        return
+
+    report = archive.compact(
+        max_chats=args.max_chats, days=args.days, vacuum=not args.no_vacuum
+    )
+    print(json.dumps(report, default=str, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend maintenance tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser(
+        "rebuild-rollup", help="Recompute sales_rollup and sales_daily from bills"
+    )
+    cmd.add_argument("--vendor-id", type=int)
+    cmd.set_defaults(func=rebuild_rollup)
+
+    cmd = commands.add_parser(
+        "verify-rollup", help="Compare sales_rollup against bills"
+    )
+    cmd.add_argument("--vendor-id", type=int)
+    cmd.set_defaults(func=verify_rollup)
+
+    cmd = commands.add_parser(
+        "archive-messages",
+        help="Move history of idle chats into compressed blocks, then vacuum"
+    )
+    cmd.add_argument("--days", type=int, default=archive.ARCHIVE_AFTER_DAYS)
+    cmd.add_argument("--max-chats", type=int,
+                     help="stop after this many chats; the next run resumes")
+    cmd.add_argument("--no-vacuum", action="store_true")
+    cmd.add_argument("--full-vacuum", action="store_true",
+                     help="one-off VACUUM that enables incremental vacuum on an old file")
+    cmd.set_defaults(func=archive_messages)
+
+    args = parser.parse_args(argv)
+    init_db()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
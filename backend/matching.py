@@ -0,0 +1,197 @@
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+
+import models
+import response_cache
+from discovery import PROFILES_VERSION, split_content_types
+
+# Relative weight of each signal in the final score (sums to 1)
+W_TEXT = 0.45       # campaign text vs. profile bio
+W_FACET = 0.30      # campaign text mentions the profile's niche/content types
+W_ENGAGEMENT = 0.15
+W_AVAILABILITY = 0.10
+
+ENGAGEMENT_SCORES = {"high": 1.0, "medium": 0.6, "low": 0.3}
+AVAILABILITY_SCORES = {"open": 1.0}
+DEFAULT_AVAILABILITY = 0.3
+
+# Matches cached per campaign; requests beyond this are capped
+MAX_MATCHES = 100
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "our", "the", "this", "to", "we", "with",
+    "you", "your",
+}
+
+
+def tokenize(text: str) -> list:
+    return [
+        t for t in re.findall(r"\w+", (text or "").lower())
+        if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+def _unit_vector(tokens: list) -> dict:
+    counts = defaultdict(float)
+    for t in tokens:
+        counts[t] += 1
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {t: c / norm for t, c in counts.items()} if norm else {}
+
+
+def _facet_terms(profile) -> dict:
+    # Every niche/content-type token counts equally; a profile scores 1
+    # when the campaign mentions all of them
+    terms = set(tokenize(profile.niche))
+    for content_type in split_content_types(profile.content_types):
+        terms.update(tokenize(content_type))
+    return {t: 1 / len(terms) for t in terms} if terms else {}
+
+
+def _prior(profile) -> float:
+    engagement = ENGAGEMENT_SCORES.get((profile.engagement or "").lower(), 0)
+    availability = AVAILABILITY_SCORES.get(
+        (profile.availability or "").lower(), DEFAULT_AVAILABILITY
+    )
+    return W_ENGAGEMENT * engagement + W_AVAILABILITY * availability
+
+
+class MatchEngine:
+    """Sparse term-weight index over influencer profiles.
+
+    Profile vectors are precomputed once and kept in inverted posting
+    lists, so scoring a campaign touches only the profiles that share a
+    term with it instead of every profile. Profiles sharing nothing can
+    only score their prior, so they are taken from a prior-sorted list
+    when topping up to k.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._text = defaultdict(dict)    # term -> {profile_id: weight}
+        self._facets = defaultdict(dict)  # term -> {profile_id: weight}
+        self._terms = {}                  # profile_id -> (text terms, facet terms)
+        self._priors = {}                 # profile_id -> prior score
+        self._by_prior = None             # [(prior, profile_id)] best first
+        self._cache = {}                  # campaign_id -> [(score, id, parts)]
+
+    def ensure_loaded(self, db):
+        # Rebuilt whenever any worker has written profiles since, as with
+        # discovery.FacetIndex
+        version = response_cache.versions.get(db, PROFILES_VERSION)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            self._text = defaultdict(dict)
+            self._facets = defaultdict(dict)
+            self._terms = {}
+            self._priors = {}
+            self._by_prior = None
+            self._cache = {}
+            columns = [
+                getattr(models.InfluencerProfile, c) for c in
+                ("id", "bio", "niche", "content_types", "engagement", "availability")
+            ]
+            for profile in db.query(*columns).yield_per(5000):
+                self._add(profile)
+            self._version = version
+
+    def update(self, profile: models.InfluencerProfile, version: int):
+        with self._lock:
+            # Every cached ranking may now be wrong
+            self._cache.clear()
+            if self._version != version - 1:
+                return
+            self._remove(profile.id)
+            self._add(profile)
+            self._version = version
+
+    def _add(self, profile):
+        text = _unit_vector(tokenize(profile.bio))
+        facets = _facet_terms(profile)
+        for term, weight in text.items():
+            self._text[term][profile.id] = weight
+        for term, weight in facets.items():
+            self._facets[term][profile.id] = weight
+        self._terms[profile.id] = (list(text), list(facets))
+        self._priors[profile.id] = _prior(profile)
+        self._by_prior = None
+
+    def _remove(self, profile_id: int):
+        text_terms, facet_terms = self._terms.pop(profile_id, ((), ()))
+        for term in text_terms:
+            self._text[term].pop(profile_id, None)
+        for term in facet_terms:
+            self._facets[term].pop(profile_id, None)
+        self._priors.pop(profile_id, None)
+        self._by_prior = None
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self._priors) / (1 + len(self._text.get(term, ()))))
+
+    def top_matches(self, campaign: models.Campaign, k: int) -> list:
+        with self._lock:
+            cached = self._cache.get(campaign.id)
+            if cached is None:
+                cached = self._cache[campaign.id] = self._score(campaign)
+            return cached[:k]
+
+    def _score(self, campaign: models.Campaign) -> list:
+        tokens = tokenize(f"{campaign.product_name} {campaign.description}")
+
+        # The query side carries idf; profile vectors stay idf-free so a
+        # single update never forces the other profiles to be rescored.
+        # Terms no bio contains can't match and would only shrink every
+        # text score through the norm.
+        known = [t for t in tokens if self._text.get(t)]
+        query = {t: w * self._idf(t) for t, w in _unit_vector(known).items()}
+        norm = math.sqrt(sum(w * w for w in query.values())) or 1
+
+        text_scores = defaultdict(float)
+        for term, q_weight in query.items():
+            for pid, weight in self._text.get(term, {}).items():
+                text_scores[pid] += q_weight * weight / norm
+
+        facet_scores = defaultdict(float)
+        for term in set(tokens):
+            for pid, weight in self._facets.get(term, {}).items():
+                facet_scores[pid] += weight
+
+        candidates = text_scores.keys() | facet_scores.keys()
+        scored = [
+            (
+                W_TEXT * text_scores.get(pid, 0)
+                + W_FACET * facet_scores.get(pid, 0)
+                + self._priors[pid],
+                pid,
+                {
+                    "text": round(text_scores.get(pid, 0), 4),
+                    "facets": round(facet_scores.get(pid, 0), 4),
+                },
+            )
+            for pid in candidates
+        ]
+
+        # Top up with the best profiles that matched nothing
+        if self._by_prior is None:
+            self._by_prior = sorted(
+                ((p, pid) for pid, p in self._priors.items()), reverse=True
+            )
+        filler = []
+        for prior, pid in self._by_prior:
+            if len(filler) >= MAX_MATCHES:
+                break
+            if pid not in candidates:
+                filler.append((prior, pid, {"text": 0, "facets": 0}))
+
+        return heapq.nlargest(MAX_MATCHES, scored + filler, key=lambda s: s[0])
+
+
+engine = MatchEngine()
@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# Requests slower than this are logged with the SQL they ran; 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Statements kept per request for the slow log
+SLOW_LOG_MAX_STATEMENTS = 50
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+logger = logging.getLogger("slow_requests")
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = []
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+class Registry:
+    """Process-wide counters and histograms, rendered for Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}     # (method, route, status) -> count
+        self._latency = {}      # (method, route) -> Histogram
+        self._queries = {}      # (method, route) -> Histogram
+        self._db_seconds = {}   # (method, route) -> float
+        self._spans = {}        # (name, outcome) -> Histogram
+        self._admission = {}    # (class, decision) -> count
+        self._gauges = []       # callables returning {name: value}
+
+    def record_request(self, method: str, route: str, status: int,
+                       seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            status_key = (method, route, status)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            self._latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self._queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            self._db_seconds[key] = self._db_seconds.get(key, 0.0) + stats.db_seconds
+
+    def record_span(self, name: str, outcome: str, seconds: float):
+        with self._lock:
+            self._spans.setdefault(
+                (name, outcome), Histogram(LATENCY_BUCKETS)
+            ).observe(seconds)
+
+    def record_admission(self, name: str, decision: str):
+        key = (name, decision)
+        with self._lock:
+            self._admission[key] = self._admission.get(key, 0) + 1
+
+    def add_gauges(self, collect):
+        self._gauges.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP http_requests_total Requests by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self._requests.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"http_requests_total{labels} {count}")
+
+            lines += _histogram(
+                "http_request_duration_seconds", "Request latency by route.",
+                self._latency, ("method", "route"),
+            )
+            lines += _histogram(
+                "db_queries_per_request", "SQL statements issued per request.",
+                self._queries, ("method", "route"),
+            )
+
+            lines += [
+                "# HELP db_time_seconds_total Time spent in SQL per route.",
+                "# TYPE db_time_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self._db_seconds.items()):
+                labels = _labels(method=method, route=route)
+                lines.append(f"db_time_seconds_total{labels} {seconds:.6f}")
+
+            lines += _histogram(
+                "span_duration_seconds", "Timed spans such as upstream AI calls.",
+                self._spans, ("span", "outcome"),
+            )
+
+            lines += [
+                "# HELP admission_decisions_total Admission decisions by endpoint class.",
+                "# TYPE admission_decisions_total counter",
+            ]
+            for (name, decision), count in sorted(self._admission.items()):
+                labels = _labels(**{"class": name, "decision": decision})
+                lines.append(f"admission_decisions_total{labels} {count}")
+            gauges = list(self._gauges)
+
+        for collect in gauges:
+            for name, value in sorted(collect().items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram(name: str, help_text: str, histograms: dict, label_names: tuple) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, hist in sorted(histograms.items()):
+        base = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**base, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(**base, le='+Inf')} {hist.total}")
+        lines.append(f"{name}_sum{_labels(**base)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_labels(**base)} {hist.total}")
+    return lines
+
+
+registry = Registry()
+
+
+# --------------------
+# SQL HOOKS
+# --------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_metrics_started", None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    if SLOW_REQUEST_MS and len(stats.statements) < SLOW_LOG_MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+def instrument_engine(engine):
+    # Async engines are instrumented through their sync_engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --------------------
+# SPANS
+# --------------------
+
+@contextmanager
+def span(name: str):
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        registry.record_span(name, outcome, time.perf_counter() - started)
+
+
+# --------------------
+# ASGI MIDDLEWARE
+# --------------------
+
+class MetricsMiddleware:
+    """Times each HTTP request and attributes its SQL to the matched route.
+
+    Sync routes run in a threadpool with a copy of this context, and the
+    async engine's greenlets inherit it too, so the hooks above find the
+    same RequestStats either way.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+
+            # Label by route template, not raw path, to bound cardinality
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            registry.record_request(scope["method"], route, status, elapsed, stats)
+
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(scope, route, status, elapsed, stats)
+
+
+def _log_slow(scope, route: str, status: int, elapsed: float, stats: RequestStats):
+    lines = [
+        f"{scope['method']} {scope['path']} ({route}) -> {status} in "
+        f"{elapsed * 1000:.1f}ms, {stats.queries} queries, "
+        f"{stats.db_seconds * 1000:.1f}ms in SQL"
+    ]
+    for seconds, statement in stats.statements:
+        lines.append(f"  [{seconds * 1000:.1f}ms] {' '.join(statement.split())}")
+    if stats.queries > len(stats.statements):
+        lines.append(f"  ... {stats.queries - len(stats.statements)} more")
+    logger.warning("\n".join(lines))
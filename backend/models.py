@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Date, Float, Index, LargeBinary, event, text
 from db import Base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -20,6 +20,12 @@ class Campaign(Base):
     product_name = Column(String)
     description = Column(Text)
 
+    # Full-text search lives in the campaigns_fts FTS5 table, created and
+    # kept in sync by triggers in crud.ensure_campaign_search()
+    __table_args__ = (
+        Index("ix_campaigns_vendor_id_id", "vendor_id", "id"),
+    )
+
 
 class Chat(Base):
     __tablename__ = "chats"
@@ -29,6 +35,27 @@ class Chat(Base):
     vendor_id = Column(Integer, ForeignKey("users.id"))
     influencer_id = Column(Integer, ForeignKey("users.id"))
 
+    # Denormalized by crud.create_message so the inbox needs no
+    # per-chat MAX(id) lookups
+    last_message_id = Column(Integer)
+    last_activity_at = Column(DateTime)
+    # Messages with ids up to here were moved to message_archive_blocks
+    archived_through_id = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_chats_vendor_id_activity", "vendor_id", "last_activity_at"),
+        Index("ix_chats_influencer_id_activity", "influencer_id", "last_activity_at"),
+    )
+
+
+class ChatReadMarker(Base):
+    # Highest message id each participant has seen in a chat
+    __tablename__ = "chat_read_markers"
+
+    chat_id = Column(Integer, ForeignKey("chats.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False, default=0)
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -39,6 +66,12 @@ class Message(Base):
     text = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Keyset pagination walks a chat's history by id, so (chat_id, id)
+    # serves both the filter and the ordering without a sort step.
+    __table_args__ = (
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+    )
+
 class InfluencerProfile(Base):
     __tablename__ = "influencer_profiles"
 
@@ -75,4 +108,235 @@ class Bill(Base):
     cost_price = Column(Float)          # per unit
     selling_price = Column(Float)       # per unit
     profit = Column(Float, nullable=False)        
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_bills_vendor_id_created_at", "vendor_id", "created_at"),
+    )
+
+
+class SalesRollup(Base):
+    # Running per-product totals for /analytics, kept current by
+    # crud.create_bill in the same transaction as the bill rows.
+    __tablename__ = "sales_rollup"
+
+    vendor_id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0)
+    profit = Column(Float, nullable=False, default=0)
+
+
+class SalesDaily(Base):
+    # One row per vendor per UTC day; /analytics/{vendor_id}/timeseries
+    # buckets these instead of scanning bills.
+    __tablename__ = "sales_daily"
+
+    vendor_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0)
+    profit = Column(Float, nullable=False, default=0)
+
+
+class AiInsightCache(Base):
+    # Persistent tier of insight_cache, keyed by analytics fingerprint
+    __tablename__ = "ai_insight_cache"
+
+    key = Column(String, primary_key=True)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AiJob(Base):
+    # Background marketing-insight runs; see jobs.py
+    __tablename__ = "ai_jobs"
+
+    id = Column(String, primary_key=True)
+    vendor_id = Column(Integer, index=True)
+    status = Column(String, nullable=False)   # queued | running | done | failed
+    payload = Column(Text, nullable=False)    # extract_ai_analytics output
+    result = Column(Text)                     # parsed insights as JSON
+    error = Column(Text)
+    owner = Column(String)                    # jobs.WORKER_ID of the claimant
+    lease_expires_at = Column(DateTime)       # a running job past this is abandoned
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TokenLedger(Base):
+    # Append-only record of every token balance change
+    __tablename__ = "token_ledger"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    delta = Column(Integer, nullable=False)          # negative for spends
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(String)
+    idempotency_key = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_token_ledger_user_id_id", "user_id", "id"),
+        # A retried deduction with the same key can only ever land once
+        Index(
+            "ux_token_ledger_user_id_key", "user_id", "idempotency_key",
+            unique=True
+        ),
+    )
+
+
+class IdempotencyKey(Base):
+    # Responses of writes sent with an Idempotency-Key header, replayed
+    # when the client retries. Rows expire after idempotency.TTL_SECONDS.
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String, primary_key=True)    # e.g. "messages:<sender_id>"
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class CacheVersion(Base):
+    # Bumped in the transaction of every write that changes a cached
+    # response (see response_cache), so all workers and processes agree
+    __tablename__ = "cache_versions"
+
+    key = Column(String, primary_key=True)      # e.g. "products:<vendor_id>"
+    version = Column(Integer, nullable=False, default=0)
+
+
+class MessageArchiveBlock(Base):
+    # Compressed runs of messages from inactive chats; see archive.py
+    __tablename__ = "message_archive_blocks"
+
+    chat_id = Column(Integer, primary_key=True)
+    first_id = Column(Integer, primary_key=True)
+    last_id = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)     # zlib-compressed columnar JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchiveRun(Base):
+    # One pass of archive.compact(); an unfinished run is resumed from
+    # cursor_chat_id by the next pass
+    __tablename__ = "archive_runs"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False)        # running | done
+    cutoff = Column(DateTime, nullable=False)      # chats idle since before this
+    cursor_chat_id = Column(Integer, nullable=False, default=0)
+    chats_archived = Column(Integer, nullable=False, default=0)
+    messages_archived = Column(Integer, nullable=False, default=0)
+    raw_bytes = Column(Integer, nullable=False, default=0)
+    compressed_bytes = Column(Integer, nullable=False, default=0)
+    file_bytes_before = Column(Integer)
+    file_bytes_after = Column(Integer)
+    reclaimed_bytes = Column(Integer)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+
+# One conversation per campaign and pair; crud.create_or_get_chat relies
+# on it to resolve concurrent opens.
+ux_chats_campaign_participants = Index(
+    "ux_chats_campaign_participants",
+    Chat.campaign_id, Chat.vendor_id, Chat.influencer_id,
+    unique=True
+)
+
+# Databases from before the index may hold duplicate chats. Fold each
+# duplicate into the oldest copy right before the index is built; the
+# listener only fires when the index is actually created.
+MERGE_DUPLICATE_CHATS = [
+    """
+    CREATE TEMP TABLE chat_duplicates AS
+    SELECT c.id AS dup_id, k.keep_id
+    FROM chats c
+    JOIN (
+        SELECT campaign_id, vendor_id, influencer_id, MIN(id) AS keep_id
+        FROM chats
+        GROUP BY campaign_id, vendor_id, influencer_id
+        HAVING COUNT(*) > 1
+    ) k
+      ON c.campaign_id = k.campaign_id
+     AND c.vendor_id = k.vendor_id
+     AND c.influencer_id = k.influencer_id
+     AND c.id <> k.keep_id
+    """,
+    """
+    UPDATE messages
+    SET chat_id = (SELECT keep_id FROM chat_duplicates WHERE dup_id = messages.chat_id)
+    WHERE chat_id IN (SELECT dup_id FROM chat_duplicates)
+    """,
+    """
+    INSERT INTO chat_read_markers (chat_id, user_id, last_read_message_id)
+    SELECT d.keep_id, m.user_id, MAX(m.last_read_message_id)
+    FROM chat_read_markers m
+    JOIN chat_duplicates d ON d.dup_id = m.chat_id
+    WHERE true
+    GROUP BY d.keep_id, m.user_id
+    ON CONFLICT (chat_id, user_id) DO UPDATE SET
+        last_read_message_id = MAX(last_read_message_id, excluded.last_read_message_id)
+    """,
+    "DELETE FROM chat_read_markers WHERE chat_id IN (SELECT dup_id FROM chat_duplicates)",
+    """
+    UPDATE chats
+    SET last_message_id = (
+            SELECT MAX(id) FROM messages WHERE messages.chat_id = chats.id
+        ),
+        last_activity_at = (
+            SELECT created_at FROM messages
+            WHERE messages.chat_id = chats.id
+            ORDER BY id DESC LIMIT 1
+        )
+    WHERE id IN (SELECT keep_id FROM chat_duplicates)
+    """,
+    "DELETE FROM chats WHERE id IN (SELECT dup_id FROM chat_duplicates)",
+    "DROP TABLE chat_duplicates",
+]
+
+
+@event.listens_for(ux_chats_campaign_participants, "before_create")
+def _merge_duplicate_chats(index, connection, **kw):
+    # Also fires for a brand-new chats table, before messages exists
+    duplicated = connection.execute(text("""
+        SELECT 1 FROM chats
+        GROUP BY campaign_id, vendor_id, influencer_id
+        HAVING COUNT(*) > 1
+        LIMIT 1
+    """)).first()
+    if duplicated is None:
+        return
+    for statement in MERGE_DUPLICATE_CHATS:
+        connection.execute(text(statement))
+
+
+# At most one queued or running insight job per vendor; jobs.enqueue
+# inserts with ON CONFLICT DO NOTHING against it and shares the winner.
+AI_JOB_ACTIVE = "status IN ('queued', 'running')"
+ux_ai_jobs_vendor_active = Index(
+    "ux_ai_jobs_vendor_active",
+    AiJob.vendor_id,
+    unique=True,
+    sqlite_where=text(AI_JOB_ACTIVE),
+)
+
+
+@event.listens_for(ux_ai_jobs_vendor_active, "before_create")
+def _fail_duplicate_active_jobs(index, connection, **kw):
+    # Older databases may hold several active jobs for one vendor; keep
+    # the oldest and mark the rest failed so the index can be built
+    connection.execute(text(f"""
+        UPDATE ai_jobs SET status = 'failed', error = 'Superseded by an earlier job'
+        WHERE {AI_JOB_ACTIVE}
+          AND rowid NOT IN (
+              SELECT MIN(rowid) FROM ai_jobs WHERE {AI_JOB_ACTIVE} GROUP BY vendor_id
+          )
+    """))
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Set
+
+# Messages buffered per websocket before the connection is treated as
+# too slow and dropped. A dropped client reconnects with ?after_id= and
+# catches up from the database, so nothing is lost.
+SEND_QUEUE_SIZE = 100
+
+
+# --------------------
+# BROKERS
+# --------------------
+
+class Broker:
+    """Carries published messages to every worker's hub.
+
+    publish() may be called from any thread. A multi-worker deployment
+    swaps in a broker backed by a shared channel (Redis pub/sub, Postgres
+    LISTEN/NOTIFY, ...) that calls each attached callback on delivery.
+    """
+
+    def attach(self, deliver: Callable[[int, dict], None]):
+        raise NotImplementedError
+
+    def publish(self, chat_id: int, payload: dict):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    # Loopback delivery for a single process (and for tests)
+
+    def __init__(self):
+        self._callbacks = []
+
+    def attach(self, deliver):
+        self._callbacks.append(deliver)
+
+    def publish(self, chat_id, payload):
+        for deliver in self._callbacks:
+            deliver(chat_id, payload)
+
+
+# --------------------
+# HUB
+# --------------------
+
+class Subscription:
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class ChatHub:
+    def __init__(self, broker: Broker = None):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self.set_broker(broker or InMemoryBroker())
+
+    def set_broker(self, broker: Broker):
+        self.broker = broker
+        broker.attach(self._deliver)
+
+    def subscribe(self, chat_id: int) -> Subscription:
+        # The first websocket tells us which event loop owns the queues
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(chat_id)
+        with self._lock:
+            self._subscribers.setdefault(chat_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.chat_id)
+            if subs is None:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.chat_id]
+
+    def publish(self, chat_id: int, payload: dict):
+        self.broker.publish(chat_id, payload)
+
+    def _deliver(self, chat_id: int, payload: dict):
+        # Called by the broker, possibly from a threadpool worker
+        if self._loop is None or chat_id not in self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._fan_out, chat_id, payload)
+
+    def _fan_out(self, chat_id: int, payload: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(chat_id, ()))
+
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Never block the fan-out on one slow reader
+                self._drop(sub)
+
+    def _drop(self, sub: Subscription):
+        self.unsubscribe(sub)
+        sub.overflowed = True
+
+        # The client resyncs from the DB on reconnect, so the backlog can
+        # go; the None sentinel tells its sender loop to close.
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+
+hub = ChatHub()
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import models
+import serialization
+
+# Serialized bodies kept in memory across all cached routes
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def _key(key: tuple) -> str:
+    return ":".join(str(part) for part in key)
+
+
+class Versions:
+    """Counters per cached entity, kept in the cache_versions table.
+
+    Writers bump inside their own transaction, so the new version becomes
+    visible exactly when the data does: to every worker, and to writes
+    made by manage.py or other processes through crud.
+    """
+
+    def get(self, db: Session, key: tuple) -> int:
+        version = db.scalar(
+            select(models.CacheVersion.version)
+            .where(models.CacheVersion.key == _key(key))
+        )
+        return version or 0
+
+    def bump(self, db: Session, key: tuple) -> int:
+        stmt = sqlite_insert(models.CacheVersion).values(key=_key(key), version=1)
+        return db.execute(stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"version": models.CacheVersion.version + 1},
+        ).returning(models.CacheVersion.version)).scalar_one()
+
+
+class ResponseCache:
+    """LRU of encoded JSON bodies keyed by URL, bounded by total size."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # url -> (etag, body)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, url: str, etag: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(url)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, url: str, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[url] = (etag, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def respond(self, request: Request, db: Session, key: tuple, build,
+                adapter: TypeAdapter) -> Response:
+        # The version read opens db's read transaction, so build() sees
+        # the same snapshot and the body always matches its tag
+        url = str(request.url.path) + "?" + str(request.url.query)
+        tag = hashlib.sha1(
+            f"{url}|{versions.get(db, key)}".encode()
+        ).hexdigest()[:16]
+        etag = f'W/"{tag}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag in _parse_if_none_match(request.headers.get("if-none-match")):
+            self._count("not_modified")
+            return Response(status_code=304, headers=headers)
+
+        body = self.get(url, etag)
+        if body is None:
+            self._count("misses")
+            body = serialization.encode(adapter, build())
+            self.put(url, etag, body)
+
+        return Response(body, media_type="application/json", headers=headers)
+
+
+def _parse_if_none_match(value: str) -> set:
+    if not value:
+        return set()
+    return {tag.strip() for tag in value.split(",")}
+
+
+versions = Versions()
+cache = ResponseCache()
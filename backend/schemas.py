@@ -1,24 +1,68 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class UserCreate(BaseModel):
     email: str
     role: str
 
 
+class UserOut(UserCreate):
+    id: int
+    tokens: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class CampaignCreate(BaseModel):
     vendor_id: int
     product_name: str
     description: str
 
 
+class CampaignOut(CampaignCreate):
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class ChatCreate(BaseModel):
     campaign_id: int
     vendor_id: int
     influencer_id: int
 
 
+class ChatOut(ChatCreate):
+    id: int
+    last_message_id: Optional[int] = None
+    last_activity_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class InboxChatOut(BaseModel):
+    # One row of crud.INBOX_SQL
+    id: int
+    campaign_id: int
+    campaign_name: Optional[str] = None
+    vendor_id: int
+    influencer_id: int
+    counterpart_id: Optional[int] = None
+    counterpart_email: Optional[str] = None
+    counterpart_role: Optional[str] = None
+    counterpart_name: Optional[str] = None
+    last_message_id: Optional[int] = None
+    last_message_sender_id: Optional[int] = None
+    last_message_text: Optional[str] = None
+    last_activity_at: Optional[datetime] = None
+    unread_count: int
+
+
+class ChatRead(BaseModel):
+    user_id: int
+    last_read_message_id: Optional[int] = None  # defaults to latest
+
+
 class MessageCreate(BaseModel):
     chat_id: int
     sender_id: int
@@ -32,8 +76,7 @@ class MessageOut(BaseModel):
     text: str
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ProfileCreate(BaseModel):
     user_id: int
@@ -48,6 +91,35 @@ class ProfileCreate(BaseModel):
 class ProfileOut(ProfileCreate):
     pass
 
+class InfluencerOut(ProfileOut):
+    id: int
+
+class InfluencerSearchOut(BaseModel):
+    total: int
+    results: List[InfluencerOut]
+    facets: Dict[str, Dict[str, int]]
+    next_before_id: Optional[int] = None
+
+class CampaignMatchOut(BaseModel):
+    score: float
+    signals: Dict[str, float]
+    profile: ProfileOut
+
+
+# -------- TOKENS --------
+class TokenEntryOut(BaseModel):
+    id: int
+    delta: int
+    balance_after: int
+    reason: Optional[str] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class TokenHistoryOut(BaseModel):
+    entries: List[TokenEntryOut]
+    next_before_id: Optional[int] = None
+
 # -------- PRODUCTS --------
 class ProductCreate(BaseModel):
     vendor_id: int
@@ -59,20 +131,22 @@ class ProductCreate(BaseModel):
 class ProductOut(ProductCreate):
     id: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # -------- BILLS --------
 class BillItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)     # a negative line would put stock back
     selling_price: float
 
 class BillCreate(BaseModel):
     vendor_id: int
     items: List[BillItemCreate]
 
+class BulkBillCreate(BillCreate):
+    sold_at: Optional[datetime] = None  # original POS sale time, UTC
+
 class BillItemOut(BaseModel):
     product_name: str
     quantity: int
@@ -85,3 +159,78 @@ class BillOut(BaseModel):
     grand_total: float
     total_profit: float
 
+
+# -------- ANALYTICS --------
+class SalesRowOut(BaseModel):
+    name: str
+    quantity: int
+    revenue: float
+    cost: float
+    profit: float
+
+class SalesKpisOut(BaseModel):
+    total_revenue: float
+    total_cost: float
+    total_profit: float
+    total_units_sold: int
+    product_count: int
+
+class AnalyticsOut(BaseModel):
+    kpis: SalesKpisOut
+    sales: List[SalesRowOut]
+
+class TimeseriesPointOut(BaseModel):
+    bucket: str
+    units: int
+    revenue: float
+    cost: float
+    profit: float
+
+class TimeseriesOut(BaseModel):
+    vendor_id: int
+    from_: str = Field(alias="from")
+    to: str
+    bucket: str
+    series: List[TimeseriesPointOut]
+
+
+# -------- COMPOSITE VIEWS --------
+# Everything one page needs on first load, in a single response
+class SessionOut(BaseModel):
+    user: UserOut
+    tokens: int
+    profile: Optional[ProfileOut] = None
+
+class ChatViewOut(BaseModel):
+    chat: ChatOut
+    campaign: Optional[CampaignOut] = None
+    counterpart: Optional[UserOut] = None
+    counterpart_profile: Optional[ProfileOut] = None
+    last_read_message_id: int
+    messages: List[MessageOut]
+
+class VendorDashboardOut(BaseModel):
+    vendor: UserOut
+    products: List[ProductOut]
+    campaigns: List[CampaignOut]
+    analytics: AnalyticsOut
+
+
+# -------- ADAPTERS --------
+# Built once at import; routes encode through these straight to JSON
+# bytes (serialization.respond) instead of walking each row with
+# jsonable_encoder on every request.
+CAMPAIGN_LIST = TypeAdapter(List[CampaignOut])
+CAMPAIGN_MATCH_LIST = TypeAdapter(List[CampaignMatchOut])
+CHAT_LIST = TypeAdapter(List[ChatOut])
+INBOX = TypeAdapter(List[InboxChatOut])
+MESSAGE_LIST = TypeAdapter(List[MessageOut])
+PRODUCT_LIST = TypeAdapter(List[ProductOut])
+PROFILE = TypeAdapter(Optional[ProfileOut])
+INFLUENCER_SEARCH = TypeAdapter(InfluencerSearchOut)
+TOKEN_HISTORY = TypeAdapter(TokenHistoryOut)
+ANALYTICS = TypeAdapter(AnalyticsOut)
+TIMESERIES = TypeAdapter(TimeseriesOut)
+SESSION = TypeAdapter(SessionOut)
+CHAT_VIEW = TypeAdapter(ChatViewOut)
+VENDOR_DASHBOARD = TypeAdapter(VendorDashboardOut)
@@ -0,0 +1,24 @@
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+def encode(adapter: TypeAdapter, value) -> bytes:
+    """JSON bytes for value, validated and serialized by pydantic-core.
+
+    from_attributes lets ORM objects and RowMappings go straight in
+    without being turned into dicts first.
+    """
+    return adapter.dump_json(
+        adapter.validate_python(value, from_attributes=True),
+        by_alias=True,
+    )
+
+
+def respond(adapter: TypeAdapter, value, status_code: int = 200) -> Response:
+    # A Response is passed through as is, so FastAPI neither re-validates
+    # it against response_model nor runs jsonable_encoder over it
+    return Response(
+        encode(adapter, value),
+        status_code=status_code,
+        media_type="application/json",
+    )
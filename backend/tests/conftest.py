@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# db.py binds its engines to DATABASE_URL at import, so point it at a
+# scratch file before any app module is imported
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import models  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def session_factory():
+    db.init_db()
+    return db.SessionLocal
+
+
+@pytest.fixture
+def make_user(session_factory):
+    def make(role="vendor", tokens=200):
+        with session_factory() as session:
+            user = models.User(
+                email=f"{uuid.uuid4().hex}@example.com", role=role, tokens=tokens
+            )
+            session.add(user)
+            session.commit()
+            return user.id
+    return make
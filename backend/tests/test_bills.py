@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import crud
+import models
+import schemas
+
+
+def make_product(session_factory, vendor_id, stock):
+    with session_factory() as session:
+        product = models.Product(
+            vendor_id=vendor_id, product_name="Widget",
+            cost_price=2.0, quantity_available=stock,
+        )
+        session.add(product)
+        session.commit()
+        return product.id
+
+
+def test_parallel_checkouts_never_oversell(session_factory, make_user):
+    vendor_id = make_user()
+    product_id = make_product(session_factory, vendor_id, stock=50)
+    bill = schemas.BillCreate(
+        vendor_id=vendor_id,
+        items=[{"product_id": product_id, "quantity": 2, "selling_price": 3.0}],
+    )
+
+    def checkout(_):
+        with session_factory() as session:
+            try:
+                crud.create_bill(session, bill)
+                return "ok"
+            except HTTPException as exc:
+                assert exc.status_code == 400
+                return "rejected"
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(checkout, range(60)))
+
+    assert results.count("ok") == 25
+    assert results.count("rejected") == 35
+    with session_factory() as session:
+        assert session.get(models.Product, product_id).quantity_available == 0
+        sold = session.query(models.Bill).filter_by(product_id=product_id).all()
+        assert sum(b.quantity for b in sold) == 50
+
+
+@pytest.mark.parametrize("quantity", [0, -3])
+def test_non_positive_quantity_is_rejected(quantity):
+    with pytest.raises(ValidationError):
+        schemas.BillCreate(
+            vendor_id=1,
+            items=[{"product_id": 1, "quantity": quantity, "selling_price": 3.0}],
+        )
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+import models
+
+ANALYTICS = {"kpis": {}, "top_products": [], "underperforming_products": []}
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = jobs.JobRunner(workers=1)
+    calls = []
+    # Records runs instead of calling the model
+    monkeypatch.setattr(
+        jobs.crud, "get_marketing_insights",
+        lambda db, data, timeout=None: calls.append(data) or {"suggestions": []},
+    )
+    runner.calls = calls
+    return runner
+
+
+def test_concurrent_enqueues_share_one_job(session_factory, make_user, runner, monkeypatch):
+    vendor_id = make_user()
+    monkeypatch.setattr(runner._pool, "submit", lambda *args: None)
+
+    def enqueue(_):
+        with session_factory() as session:
+            return runner.enqueue(session, vendor_id, ANALYTICS).id
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        ids = set(pool.map(enqueue, range(30)))
+
+    assert len(ids) == 1
+    assert runner.pending == 1
+    with session_factory() as session:
+        assert session.query(models.AiJob).filter_by(vendor_id=vendor_id).count() == 1
+
+
+def test_losing_enqueue_shares_a_job_that_already_finished(session_factory, make_user, runner, monkeypatch):
+    vendor_id = make_user()
+    monkeypatch.setattr(runner._pool, "submit", lambda *args: None)
+    active = runner._active
+    checks = []
+
+    def racing_active(session, vendor):
+        # Another enqueue wins between our first check and the insert, then
+        # its job finishes before we look again
+        checks.append(vendor)
+        with session_factory() as other:
+            if len(checks) == 1:
+                other.add(models.AiJob(
+                    id="winner", vendor_id=vendor, status=jobs.QUEUED, payload="{}",
+                ))
+                other.commit()
+                return None
+            other.get(models.AiJob, "winner").status = jobs.DONE
+            other.commit()
+        return active(session, vendor)
+
+    monkeypatch.setattr(runner, "_active", racing_active)
+    with session_factory() as session:
+        job = runner.enqueue(session, vendor_id, ANALYTICS)
+
+    assert job.id == "winner"
+    assert job.status == jobs.DONE
+    assert runner.pending == 0
+
+def test_a_job_runs_once_however_many_workers_hold_it(session_factory, make_user, runner):
+    vendor_id = make_user()
+    with session_factory() as session:
+        session.add(models.AiJob(
+            id="held-twice", vendor_id=vendor_id, status=jobs.QUEUED, payload="{}",
+        ))
+        session.commit()
+
+    runner._pending = 2
+    runner._run("held-twice")
+    runner._run("held-twice")
+
+    assert len(runner.calls) == 1
+    with session_factory() as session:
+        assert session.get(models.AiJob, "held-twice").status == jobs.DONE
+
+
+def test_recover_skips_running_jobs_with_a_live_lease(session_factory, make_user, runner):
+    live, expired = make_user(), make_user()
+    now = datetime.utcnow()
+    with session_factory() as session:
+        session.add_all([
+            models.AiJob(id="live", vendor_id=live, status=jobs.RUNNING, payload="{}",
+                         owner="other", lease_expires_at=now + timedelta(minutes=5)),
+            models.AiJob(id="expired", vendor_id=expired, status=jobs.RUNNING, payload="{}",
+                         owner="dead", lease_expires_at=now - timedelta(minutes=5)),
+        ])
+        session.commit()
+
+    submitted = []
+    runner._pool.submit = lambda fn, job_id: submitted.append(job_id)
+    runner.recover()
+
+    assert "live" not in submitted
+    assert "expired" in submitted
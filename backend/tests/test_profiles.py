@@ -0,0 +1,59 @@
+import uuid
+
+import crud
+import discovery
+import models
+import response_cache
+import schemas
+
+
+def _profile(user_id, **fields):
+    return schemas.ProfileCreate(**{
+        "user_id": user_id, "name": "Creator", "niche": "Fitness",
+        "followers_range": "10k-50k", "engagement": "High", "bio": "",
+        "availability": "Open", "content_types": ["Reels"], **fields,
+    })
+
+
+def _written_by_another_worker(session_factory, user_id, **fields):
+    # Same transaction shape as crud.create_or_update_profile, but this
+    # process's in-memory indexes are never told about it
+    with session_factory() as session:
+        row = session.query(models.InfluencerProfile).filter_by(user_id=user_id).one()
+        for field, value in fields.items():
+            setattr(row, field, value)
+        response_cache.versions.bump(session, discovery.PROFILES_VERSION)
+        session.commit()
+        return row.id
+
+
+def test_search_sees_profiles_written_by_other_workers(session_factory, make_user):
+    user_id = make_user(role="influencer")
+    before, after = f"niche-{uuid.uuid4().hex}", f"niche-{uuid.uuid4().hex}"
+    with session_factory() as session:
+        crud.create_or_update_profile(session, _profile(user_id, niche=before))
+        assert crud.search_influencers(session, {"niche": [before]})["total"] == 1
+
+    profile_id = _written_by_another_worker(session_factory, user_id, niche=after)
+
+    with session_factory() as session:
+        assert crud.search_influencers(session, {"niche": [before]})["total"] == 0
+        found = crud.search_influencers(session, {"niche": [after]})
+        assert [r["id"] for r in found["results"]] == [profile_id]
+
+
+def test_matches_see_profiles_written_by_other_workers(session_factory, make_user):
+    vendor_id, user_id = make_user(), make_user(role="influencer")
+    term = f"term{uuid.uuid4().hex}"
+    with session_factory() as session:
+        crud.create_or_update_profile(session, _profile(user_id, bio="nothing relevant"))
+        campaign = crud.create_campaign(session, vendor_id, "Launch", f"{term} {term}")
+        top = crud.get_campaign_matches(session, campaign, 1)[0]
+        assert top["signals"]["text"] == 0
+
+    _written_by_another_worker(session_factory, user_id, bio=f"all about {term}")
+
+    with session_factory() as session:
+        top = crud.get_campaign_matches(session, campaign, 1)[0]
+        assert top["profile"]["user_id"] == user_id
+        assert top["signals"]["text"] > 0
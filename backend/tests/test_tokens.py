@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+import crud
+import models
+
+
+def test_parallel_deductions_never_overspend(session_factory, make_user):
+    user_id = make_user(tokens=200)
+
+    def deduct(_):
+        with session_factory() as session:
+            return crud.deduct_tokens(session, user_id, 5)
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(deduct, range(60)))
+
+    assert results.count("INSUFFICIENT") == 20
+    with session_factory() as session:
+        assert crud.get_user_tokens(session, user_id) == 0
+        spends = session.query(models.TokenLedger).filter_by(user_id=user_id).all()
+        assert len(spends) == 40
+        assert sorted(e.balance_after for e in spends) == list(range(0, 200, 5))
+
+
+def test_retry_with_same_key_is_charged_once(session_factory, make_user):
+    user_id = make_user(tokens=100)
+
+    def deduct(_):
+        with session_factory() as session:
+            return crud.deduct_tokens(session, user_id, 10, idempotency_key="spend-1")
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(deduct, range(10)))
+
+    assert results == [90] * 10
+    with session_factory() as session:
+        assert crud.get_user_tokens(session, user_id) == 90
+
+
+def test_reused_key_with_different_amount_conflicts(session_factory, make_user):
+    user_id = make_user(tokens=100)
+    with session_factory() as session:
+        assert crud.deduct_tokens(session, user_id, 10, idempotency_key="spend-2") == 90
+
+    with session_factory() as session, pytest.raises(HTTPException) as exc:
+        crud.deduct_tokens(session, user_id, 20, idempotency_key="spend-2")
+    assert exc.value.status_code == 422
+
+    with session_factory() as session:
+        assert crud.get_user_tokens(session, user_id) == 90
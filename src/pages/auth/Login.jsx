@@ -14,19 +14,16 @@ export default function Login({ setTokens }) {
     setLoading(true);
 
     try {
-      const res = await api("/users", {
+      const { user, tokens } = await api("/session/bootstrap", {
         method: "POST",
         body: JSON.stringify({ email, role }),
       });
 
-      const userId = res.id;
-      localStorage.setItem("userId", userId);
-      localStorage.setItem("role", res.role);
+      localStorage.setItem("userId", user.id);
+      localStorage.setItem("role", user.role);
+      setTokens(tokens);
 
-      const tokenRes = await api(`/tokens/${userId}`);
-      setTokens(tokenRes.tokens);
-
-      navigate(res.role === "vendor" ? "/vendor/home" : "/influencer");
+      navigate(user.role === "vendor" ? "/vendor/home" : "/influencer");
     } catch (err) {
       alert("Login failed. Try again.");
     } finally {
@@ -14,7 +14,7 @@ export default function Register({ setTokens }) {
     setLoading(true);
 
     try {
-      const res = await api("/users", {
+      const { user, tokens } = await api("/session/bootstrap", {
         method: "POST",
         body: JSON.stringify({
           email,
@@ -22,14 +22,11 @@ export default function Register({ setTokens }) {
         }),
       });
 
-      const userId = res.id;
-      localStorage.setItem("userId", userId);
-      localStorage.setItem("role", res.role);
+      localStorage.setItem("userId", user.id);
+      localStorage.setItem("role", user.role);
+      setTokens(tokens);
 
-      const tokenRes = await api(`/tokens/${userId}`);
-      setTokens(tokenRes.tokens);
-
-      navigate(res.role === "vendor" ? "/vendor" : "/influencer");
+      navigate(user.role === "vendor" ? "/vendor" : "/influencer");
     } catch (err) {
       alert("Registration failed. Try again.");
     } finally {
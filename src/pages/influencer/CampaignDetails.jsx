@@ -19,11 +19,9 @@ export default function CampaignDetails({ tokens, setTokens }) {
       return;
     }
 
-    api("/campaigns")
-      .then((data) => {
-        const found = data.find((c) => c.id === Number(id));
-        setCampaign(found);
-      })
+    api(`/campaigns/${id}`)
+      .then(setCampaign)
+      .catch(() => setCampaign(null))
       .finally(() => setLoading(false));
   }, [id, userId, navigate]);
 
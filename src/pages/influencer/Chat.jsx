@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import PageWrapper from "../../components/common/PageWrapper";
-import { api } from "../../services/api";
+import { api, mergeMessages, subscribeToChat } from "../../services/api";
 
 export default function Chat({ tokens, setTokens }) {
   const { id } = useParams();
@@ -23,11 +23,29 @@ export default function Chat({ tokens, setTokens }) {
   const autoMsgKey = `auto_interest_sent_${userId}_${id}`;
 
   useEffect(() => {
+    let active = true;
+    let unsubscribe = null;
+
+    const markRead = () =>
+      api(`/chats/${id}/read`, {
+        method: "POST",
+        body: JSON.stringify({ user_id: userId }),
+      });
+
+    const listen = (lastId) => {
+      if (!active) return;
+      unsubscribe = subscribeToChat(id, lastId, (incoming) => {
+        setMessages((prev) => mergeMessages(prev, incoming));
+        if (incoming.some((m) => m.sender_id !== userId)) markRead();
+      });
+    };
+
     const loadMessages = async () => {
       const data = await api(`/messages/${id}`);
+      if (!active) return;
 
       if (data.length === 0 && !localStorage.getItem(autoMsgKey)) {
-        await api("/messages", {
+        const first = await api("/messages", {
           method: "POST",
           body: JSON.stringify({
             chat_id: Number(id),
@@ -38,13 +56,15 @@ export default function Chat({ tokens, setTokens }) {
 
         localStorage.setItem(autoMsgKey, "true");
 
-        const updated = await api(`/messages/${id}`);
-        setMessages(updated);
+        setMessages([first]);
         localStorage.setItem(msgKey, 1);
+        listen(first.id);
         return;
       }
 
       setMessages(data);
+      markRead();
+      listen(data.at(-1)?.id ?? 0);
 
       const influencerCount = data.filter(
         (m) => m.sender_id === userId
@@ -54,6 +74,10 @@ export default function Chat({ tokens, setTokens }) {
     };
 
     loadMessages();
+    return () => {
+      active = false;
+      unsubscribe?.();
+    };
   }, [id, userId]);
 
   useEffect(() => {
@@ -97,7 +121,7 @@ export default function Chat({ tokens, setTokens }) {
     const newCount = sentCount + 1;
     localStorage.setItem(msgKey, newCount);
 
-    setMessages((prev) => [...prev, msg]);
+    setMessages((prev) => mergeMessages(prev, [msg]));
     setInput("");
     setSending(false);
   };
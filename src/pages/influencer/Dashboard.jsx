@@ -3,15 +3,23 @@ import { useNavigate } from "react-router-dom";
 import PageWrapper from "../../components/common/PageWrapper";
 import { api } from "../../services/api";
 
+const PAGE_SIZE = 24;
+
 export default function InfluencerDashboard() {
   const navigate = useNavigate();
   const [campaigns, setCampaigns] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [hasMore, setHasMore] = useState(false);
+
+  const loadPage = async (beforeId) => {
+    const cursor = beforeId ? `&before_id=${beforeId}` : "";
+    const data = await api(`/campaigns?limit=${PAGE_SIZE}${cursor}`);
+    setCampaigns((prev) => (beforeId ? [...prev, ...data] : data));
+    setHasMore(data.length === PAGE_SIZE);
+  };
 
   useEffect(() => {
-    api("/campaigns")
-      .then((data) => setCampaigns(data))
-      .finally(() => setLoading(false));
+    loadPage().finally(() => setLoading(false));
   }, []);
 
   return (
@@ -70,6 +78,15 @@ export default function InfluencerDashboard() {
               </button>
             </div>
           ))}
+
+          {hasMore && (
+            <button
+              onClick={() => loadPage(campaigns[campaigns.length - 1].id)}
+              className="sm:col-span-2 xl:col-span-3 w-full border border-blue-200 text-blue-700 hover:bg-blue-50 py-3 rounded-xl font-medium transition"
+            >
+              Load more campaigns
+            </button>
+          )}
         </div>
       )}
     </PageWrapper>
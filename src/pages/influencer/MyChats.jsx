@@ -11,7 +11,7 @@ export default function MyChats() {
   const userId = Number(localStorage.getItem("userId"));
 
   useEffect(() => {
-    api(`/chats/user/${userId}`)
+    api(`/chats/user/${userId}/inbox`)
       .then(setChats)
       .finally(() => setLoading(false));
   }, [userId]);
@@ -46,15 +46,15 @@ export default function MyChats() {
             >
               <div>
                 <p className="font-semibold text-gray-900">
-                  Campaign #{chat.campaign_id}
+                  {chat.campaign_name || `Campaign #${chat.campaign_id}`}
                 </p>
                 <p className="text-sm text-gray-500 mt-1">
-                  Open conversation with vendor
+                  {chat.last_message_text || "Open conversation with vendor"}
                 </p>
               </div>
 
               <span className="text-blue-600 font-medium text-sm">
-                Open →
+                {chat.unread_count > 0 ? `${chat.unread_count} new` : "Open →"}
               </span>
             </div>
           ))}
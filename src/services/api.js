@@ -1,9 +1,13 @@
 const BASE_URL = "http://127.0.0.1:8000";
+const WS_URL = BASE_URL.replace(/^http/, "ws");
 
 export async function api(url, options = {}) {
+  const userId = localStorage.getItem("userId");
   const res = await fetch(`${BASE_URL}${url}`, {
     headers: {
       "Content-Type": "application/json",
+      // lets the server rate limit per user on routes without a user id
+      ...(userId ? { "X-User-Id": userId } : {}),
     },
     ...options,
   });
@@ -17,3 +21,68 @@ export async function api(url, options = {}) {
 
   return data;
 }
+
+// Live messages for one chat over /ws/chats/{id}. The socket replays
+// anything after lastId on connect; when it drops, the gap is fetched
+// with the same after_id keyset over HTTP while it reconnects with backoff.
+// Returns the unsubscribe function.
+export function subscribeToChat(chatId, lastId, onMessages) {
+  let socket = null;
+  let timer = null;
+  let retries = 0;
+  let closed = false;
+
+  const deliver = (messages) => {
+    if (closed || messages.length === 0) return;
+    lastId = Math.max(lastId, ...messages.map((m) => m.id));
+    onMessages(messages);
+  };
+
+  const connect = () => {
+    socket = new WebSocket(`${WS_URL}/ws/chats/${chatId}?after_id=${lastId}`);
+    socket.onopen = () => {
+      retries = 0;
+    };
+    socket.onmessage = (event) => deliver([JSON.parse(event.data)]);
+    socket.onclose = () => {
+      if (closed) return;
+      api(`/messages/${chatId}?after_id=${lastId}`).then(deliver).catch(() => {});
+      timer = setTimeout(connect, Math.min(1000 * 2 ** retries++, 30000));
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    socket?.close();
+  };
+}
+
+// Appends messages not already shown; a sent message arrives both as the
+// POST response and over the socket
+export function mergeMessages(current, incoming) {
+  const seen = new Set(current.map((m) => m.id));
+  const fresh = incoming.filter((m) => !seen.has(m.id));
+  if (fresh.length === 0) return current;
+  return [...current, ...fresh].sort((a, b) => a.id - b.id);
+}
+
+// One request serves every vendor page (products, campaigns, analytics).
+// Pages share the in-flight/loaded payload until a write invalidates it.
+let dashboard = null;
+
+export function vendorDashboard(vendorId) {
+  if (!dashboard || dashboard.vendorId !== vendorId) {
+    const promise = api(`/vendor/${vendorId}/dashboard`);
+    dashboard = { vendorId, promise };
+    promise.catch(() => {
+      if (dashboard?.promise === promise) dashboard = null;
+    });
+  }
+  return dashboard.promise;
+}
+
+export function invalidateVendorDashboard() {
+  dashboard = null;
+}